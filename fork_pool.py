@@ -0,0 +1,43 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Worker processes for the players' opt-in parallel searches.
+#
+# game_match.py loads players from a file under names like "player/charmer" that can't be
+# imported, so a pool can't pickle a player's functions or objects by reference. These
+# workers are forked instead: the task, and everything it refers to, is inherited as it is
+# when the first task is submitted, and only the arguments of each call and its result are
+# pickled. That needs the fork start method, which Windows doesn't have; players check
+# available() and search in their own process when it is False.
+
+_task = None  # the task of the pool this worker process belongs to
+
+def available():
+    """Whether this platform can fork, which ForkPool needs."""
+    return "fork" in multiprocessing.get_all_start_methods()
+
+def _set_task(task):
+    global _task
+    _task = task
+
+def _run_task(*args):
+    return _task(*args)
+
+class ForkPool(ProcessPoolExecutor):
+    """A process pool whose forked workers all run the same task, which may be any callable,
+    such as a closure over the position being searched. Its arguments and results must
+    pickle, so they should be plain values like moves and bounds. A pool lives for one
+    search; shut it down, or use it in a with block, so the workers exit with the search."""
+
+    def __init__(self, workers, task):
+        super().__init__(max_workers=workers, mp_context=multiprocessing.get_context("fork"),
+                         initializer=_set_task, initargs=(task,))
+
+    def submit_task(self, *args):
+        """Runs task(*args) in a worker and returns its Future."""
+        return self.submit(_run_task, *args)
+
+    def shutdown(self, wait=True, *, cancel_futures=True):
+        """As ProcessPoolExecutor.shutdown, but tasks that haven't started are dropped by
+        default: a search stops as soon as it has its answer."""
+        super().shutdown(wait=wait, cancel_futures=cancel_futures)
@@ -1,89 +1,206 @@
-import copy
+import random
+
+_zobrist_tables = {}
+
+def _zobrist_keys(width, height):
+    """Returns (edge_keys, owner_keys) for a board size, built once and cached.
+
+    Keys come from a fixed seed so equal positions hash equally across games and
+    rounds. owner_keys[player_id][box_id] is used when a box is claimed.
+    """
+    key = (width, height)
+    if key not in _zobrist_tables:
+        rng = random.Random(0)  # private generator, the global random state is left alone
+        num_edges = width * (height + 1) + height * (width + 1)
+        edge_keys = [rng.getrandbits(64) for _ in range(num_edges)]
+        owner_keys = [None] + [[rng.getrandbits(64) for _ in range(width * height)] for _ in range(2)]
+        _zobrist_tables[key] = (edge_keys, owner_keys)
+    return _zobrist_tables[key]
 
 class DotsAndBoxesGame:
+    __slots__ = ('width', 'height', 'board_size', 'box_owners', 'scores', 'current_player', 'game_over',
+                 'zobrist', '_edges', '_total_h', '_total_edges', '_all_moves', '_free_edges',
+                 '_edges_played', '_owner_bits', '_box_masks', '_boxes_for_edge', '_zobrist_edges', '_zobrist_owners')
+
     def __init__(self, width=3, height=3):
         self.width = width
         self.height = height
         self.board_size = (width, height)
-        self.horizontal_lines = set()
-        self.vertical_lines = set()
-        self.box_owners = {}  # (row, col): player_id
-        self.scores = {1: 0, 2: 0}
+        # All drawn lines packed into one bitboard, indexed by edge id (see _all_moves)
+        self._edges = 0
+        self.box_owners = bytearray(width * height)  # player_id of box (row, col) at row*width + col, 0 if unclaimed
+        self.scores = [0, 0, 0]  # indexed by player_id, slot 0 unused
         self.current_player = 1
         self.game_over = False
+        self.zobrist = 0  # hash of the drawn lines and box owners, updated on every move
+
+        self._total_h = width * (height + 1)
+        self._total_edges = self._total_h + height * (width + 1)
+        # Every move indexed by edge id: horizontal line (r, c) is r*width + c and
+        # vertical line (r, c) is _total_h + r*(width+1) + c
+        self._all_moves = [(r, c, 'H') for r in range(height + 1) for c in range(width)] + \
+                          [(r, c, 'V') for r in range(height) for c in range(width + 1)]
+        self._free_edges = (1 << self._total_edges) - 1  # bit set for each undrawn edge id
+        self._edges_played = 0
+        self._owner_bits = 0  # box_owners as 2 bits per box id, kept for pack()
+        # Packed-edge mask of the four sides of each box, indexed by box id row*width + col
+        self._box_masks = []
+        for r in range(height):
+            for c in range(width):
+                h_mask = (1 << (r * width + c)) | (1 << ((r + 1) * width + c))
+                v_mask = (1 << (r * (width + 1) + c)) | (1 << (r * (width + 1) + c + 1))
+                self._box_masks.append(h_mask | (v_mask << self._total_h))
+        # The ids of the one or two boxes bordering each edge, indexed by edge id
+        self._boxes_for_edge = []
+        for r, c, orientation in self._all_moves:
+            if orientation == 'H':
+                boxes = [(r - 1, c), (r, c)]  # above, below
+            else:
+                boxes = [(r, c - 1), (r, c)]  # left, right
+            self._boxes_for_edge.append(tuple(br * width + bc for br, bc in boxes
+                                              if 0 <= br < height and 0 <= bc < width))
+        self._zobrist_edges, self._zobrist_owners = _zobrist_keys(width, height)
+
+    @property
+    def h_bits(self):
+        """Bitboard of the drawn horizontal lines, bit r*width + c."""
+        return self._edges & ((1 << self._total_h) - 1)
+
+    @property
+    def v_bits(self):
+        """Bitboard of the drawn vertical lines, bit r*(width+1) + c."""
+        return self._edges >> self._total_h
+
+    @property
+    def horizontal_lines(self):
+        """The drawn horizontal lines as a set of (r, c) tuples."""
+        return {(i // self.width, i % self.width)
+                for i in range(self._total_h) if (self._edges >> i) & 1}
+
+    @property
+    def vertical_lines(self):
+        """The drawn vertical lines as a set of (r, c) tuples."""
+        v_bits = self._edges >> self._total_h
+        return {(i // (self.width + 1), i % (self.width + 1))
+                for i in range(self.height * (self.width + 1)) if (v_bits >> i) & 1}
 
     def get_state(self):
-        """Returns a copy of the game state for players."""
-        return {
-            "board_size": self.board_size,
-            "horizontal_lines": copy.deepcopy(self.horizontal_lines),
-            "vertical_lines": copy.deepcopy(self.vertical_lines),
-            "box_owners": copy.deepcopy(self.box_owners),
-            "your_player_id": self.current_player
-        }
+        """Returns a snapshot of the game state for players."""
+        return self.update_state({"board_size": self.board_size})
+
+    def update_state(self, state):
+        """Overwrites the fields of a dict from get_state with the current position, in place."""
+        state["horizontal_lines"] = self.horizontal_lines
+        state["vertical_lines"] = self.vertical_lines
+        state["h_bits"] = self.h_bits  # ints are immutable, so these are shared safely
+        state["v_bits"] = self.v_bits
+        state["box_owners"] = {(b // self.width, b % self.width): owner
+                               for b, owner in enumerate(self.box_owners) if owner}
+        state["your_player_id"] = self.current_player
+        state["zobrist"] = self.zobrist
+        state["packed_state"] = self.pack()
+        return state
+
+    def __deepcopy__(self, memo):
+        """Copies the game for search. The bitboards are immutable ints and the box
+        masks never change after __init__, so only the owner array and score list are cloned."""
+        clone = self.__class__.__new__(self.__class__)
+        for name in self.__slots__:
+            setattr(clone, name, getattr(self, name))
+        clone.box_owners = self.box_owners[:]
+        clone.scores = self.scores[:]
+        return clone
+
+    def pack(self):
+        """Packs the whole position into one int: the edge bitboard, then 2 bits of
+        owner per box, then the player to move. Scores follow from the owners."""
+        return self._edges | \
+            (self._owner_bits << self._total_edges) | \
+            (self.current_player << (self._total_edges + 2 * len(self.box_owners)))
+
+    def restore(self, packed):
+        """Resets the game to a position from pack(), e.g. to undo moves during search."""
+        num_boxes = len(self.box_owners)
+        self._edges = packed & ((1 << self._total_edges) - 1)
+        self._owner_bits = (packed >> self._total_edges) & ((1 << (2 * num_boxes)) - 1)
+        self.current_player = packed >> (self._total_edges + 2 * num_boxes)
+        self._free_edges = ((1 << self._total_edges) - 1) ^ self._edges
+        self._edges_played = self._edges.bit_count()
+        self.game_over = self._edges_played == self._total_edges
+        self.scores = [0, 0, 0]
+        self.zobrist = 0
+        for edge_id in range(self._total_edges):
+            if (self._edges >> edge_id) & 1:
+                self.zobrist ^= self._zobrist_edges[edge_id]
+        for box in range(num_boxes):
+            owner = (self._owner_bits >> (2 * box)) & 3
+            self.box_owners[box] = owner
+            if owner:
+                self.scores[owner] += 1
+                self.zobrist ^= self._zobrist_owners[owner][box]
+
+    def is_valid_h(self, r, c):
+        """Checks if horizontal line (r, c) is on the board and not already taken."""
+        return 0 <= r <= self.height and 0 <= c < self.width and not (self._edges >> (r * self.width + c)) & 1
+
+    def is_valid_v(self, r, c):
+        """Checks if vertical line (r, c) is on the board and not already taken."""
+        return 0 <= r < self.height and 0 <= c <= self.width and \
+            not (self._edges >> (self._total_h + r * (self.width + 1) + c)) & 1
+
+    # Orientation -> validator, so a move's orientation is dispatched on once
+    _validators = {'H': is_valid_h, 'V': is_valid_v}
 
     def is_valid_move(self, r, c, orientation):
         """Checks if a move is valid and the line is not already taken."""
-        if orientation == 'H':
-            return 0 <= r <= self.height and 0 <= c < self.width and (r, c) not in self.horizontal_lines
-        elif orientation == 'V':
-            return 0 <= r < self.height and 0 <= c <= self.width and (r, c) not in self.vertical_lines
-        return False
+        validator = self._validators.get(orientation)
+        return validator is not None and validator(self, r, c)
 
     def apply_move(self, r, c, orientation):
         """Applies a move, checks for completed boxes, and updates the score."""
         if not self.is_valid_move(r, c, orientation):
             return False, 0  # Invalid move
+        return True, self.apply_move_unchecked(r, c, orientation)
 
+    def apply_move_unchecked(self, r, c, orientation):
+        """Like apply_move but skips validation, for moves already known to be legal
+        (e.g. taken from get_available_moves). Returns the number of boxes completed."""
         if orientation == 'H':
-            self.horizontal_lines.add((r, c))
+            edge_id = r * self.width + c
         else: # 'V'
-            self.vertical_lines.add((r, c))
+            edge_id = self._total_h + r * (self.width + 1) + c
+        self._edges |= 1 << edge_id
+        self._free_edges ^= 1 << edge_id
+        self.zobrist ^= self._zobrist_edges[edge_id]
 
-        boxes_completed = self._check_for_new_boxes(r, c, orientation)
+        boxes_completed = self._check_for_new_boxes(edge_id)
         
         if boxes_completed > 0:
             self.scores[self.current_player] += boxes_completed
             # Player gets another turn
         else:
-            # Switch player
-            self.current_player = 3 - self.current_player
+            # Switch player: 1 ^ 3 == 2 and 2 ^ 3 == 1
+            self.current_player ^= 3
 
-        if len(self.horizontal_lines) + len(self.vertical_lines) == self.width * (self.height + 1) + self.height * (self.width + 1):
+        self._edges_played += 1
+        if self._edges_played == self._total_edges:
             self.game_over = True
         
-        return True, boxes_completed
+        return boxes_completed
 
-    def _check_for_new_boxes(self, r, c, orientation):
+    def _check_for_new_boxes(self, edge_id):
         completed_count = 0
-        if orientation == 'H':
-            # Check box below the line
-            if r < self.height and self._is_box_complete(r, c):
-                self.box_owners[(r, c)] = self.current_player
-                completed_count += 1
-            # Check box above the line
-            if r > 0 and self._is_box_complete(r - 1, c):
-                self.box_owners[(r - 1, c)] = self.current_player
-                completed_count += 1
-        else: # 'V'
-            # Check box to the right of the line
-            if c < self.width and self._is_box_complete(r, c):
-                self.box_owners[(r, c)] = self.current_player
-                completed_count += 1
-            # Check box to the left of the line
-            if c > 0 and self._is_box_complete(r, c - 1):
-                self.box_owners[(r, c - 1)] = self.current_player
+        # Only the boxes beside the new edge can have just been completed
+        edges = self._edges
+        box_masks = self._box_masks
+        for box in self._boxes_for_edge[edge_id]:
+            if edges & box_masks[box] == box_masks[box]:
+                self.box_owners[box] = self.current_player
+                self._owner_bits |= self.current_player << (2 * box)
+                self.zobrist ^= self._zobrist_owners[self.current_player][box]
                 completed_count += 1
         return completed_count
 
-    def _is_box_complete(self, r, c):
-        """Check if the box at (r,c) is complete."""
-        top = (r, c) in self.horizontal_lines
-        bottom = (r + 1, c) in self.horizontal_lines
-        left = (r, c) in self.vertical_lines
-        right = (r, c + 1) in self.vertical_lines
-        return top and bottom and left and right
-
     def get_winner(self):
         if not self.game_over:
             return None
@@ -95,13 +212,12 @@ class DotsAndBoxesGame:
             return 0  # Draw
 
     def get_available_moves(self):
+        """Returns the undrawn lines by walking the set bits of the free-edge mask."""
         moves = []
-        for r in range(self.height + 1):
-            for c in range(self.width):
-                if (r, c) not in self.horizontal_lines:
-                    moves.append((r, c, 'H'))
-        for r in range(self.height):
-            for c in range(self.width + 1):
-                if (r, c) not in self.vertical_lines:
-                    moves.append((r, c, 'V'))
+        all_moves = self._all_moves
+        free = self._free_edges
+        while free:
+            lsb = free & -free
+            moves.append(all_moves[lsb.bit_length() - 1])
+            free ^= lsb
         return moves
\ No newline at end of file
@@ -1,6 +1,12 @@
 import sys
+import io
+import time
+import json
+import contextlib
 import importlib.util
 import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor
 from game_logic import DotsAndBoxesGame
 
 def load_player_module(file_path):
@@ -11,22 +17,36 @@ def load_player_module(file_path):
     spec.loader.exec_module(module)
     return module
 
-def play_one_round(player1_module, player2_module, board_size, starting_player):
-    """Plays a single game of Dots and Boxes and returns the winner."""
+def play_one_round(player1_module, player2_module, board_size, starting_player, move_times=None):
+    """Plays a single game of Dots and Boxes and returns the winner.
+    If move_times is given ({1: [], 2: []}), each make_move call's duration is appended for that player."""
     game = DotsAndBoxesGame(width=board_size[0], height=board_size[1])
-    players = {1: player1_module, 2: player2_module}
+    # Bind each player's make_move once, indexed by player id, instead of looking it up every ply
+    movers = (None, player1_module.make_move, player2_module.make_move)
     game.current_player = starting_player
 
+    # One state dict is refreshed in place each ply rather than rebuilt
+    game_state = game.get_state()
+    game_state["available_moves"] = None
+    state_size = len(game_state)
+
     while not game.game_over:
-        current_player_module = players[game.current_player]
-        
-        # Get the complete game state to pass to the player
-        game_state = game.get_state()
+        # Some players stash their own keys in the state; start from a clean dict if one did
+        if len(game_state) != state_size:
+            game_state = game.get_state()
+        else:
+            game.update_state(game_state)
         game_state["available_moves"] = game.get_available_moves()
 
         try:
-            move = current_player_module.make_move(game_state)
-            is_valid, _ = game.apply_move(*move)
+            if move_times is None:
+                move = movers[game.current_player](game_state)
+            else:
+                start = time.perf_counter()
+                move = movers[game.current_player](game_state)
+                move_times[game.current_player].append(time.perf_counter() - start)
+            r, c, orientation = move
+            is_valid, _ = game.apply_move(r, c, orientation)
             if not is_valid:
                 print(f"Player {game.current_player} made an invalid move {move}. Forfeiting round.")
                 return 3 - game.current_player # the other player wins
@@ -36,19 +56,73 @@ def play_one_round(player1_module, player2_module, board_size, starting_player):
 
     return game.get_winner()
 
-def main():
+def play_indexed_round(players, round_index, board_size, benchmark):
+    """Plays round number round_index and returns (winner, move_times).
+    Starts alternate each round, the first argument player always goes first."""
+    starting_player = 1 if round_index % 2 == 0 else 2
+    move_times = {1: [], 2: []} if benchmark else None
+    winner = play_one_round(players[0], players[1], board_size, starting_player, move_times)
+    return winner, move_times
+
+_worker_players = None
+
+def _init_worker(player1_file, player2_file):
+    """Loads both players once per worker process."""
+    global _worker_players
+    _worker_players = (load_player_module(player1_file), load_player_module(player2_file))
+
+def _run_worker_round(round_index, board_size, benchmark):
+    return play_indexed_round(_worker_players, round_index, board_size, benchmark)
+
+def serve():
+    """Plays one match per line read from stdin, formatted
+    player1_file<TAB>player2_file<TAB>rounds<TAB>WIDTHxHEIGHT, and answers each with one
+    JSON line {"output": the match's usual --json output, "returncode": its exit status}.
+    An exception from a match is printed to stderr and answered with returncode 1.
+    Lets tournament.py keep one process per worker instead of starting one per match."""
+    for line in sys.stdin:
+        player1_file, player2_file, rounds, size = line.rstrip("\n").split("\t")
+        output = io.StringIO()
+        returncode = 0
+        with contextlib.redirect_stdout(output):
+            try:
+                main([player1_file, player2_file, "--rounds", rounds, "--size", size, "--json"])
+            except SystemExit as e:
+                returncode = e.code  # main printed why it stopped
+            except Exception:
+                traceback.print_exc()  # to stderr, which tournament.py keeps per match
+                returncode = 1
+        sys.stderr.flush()
+        print(json.dumps({"output": output.getvalue(), "returncode": returncode}), flush=True)
+
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Run a Dots and Boxes tournament between two AI players.") # argparser will show this if you use --help flag
     
-    parser.add_argument("player1_file", help="The python file for player 1.")
-    parser.add_argument("player2_file", help="The python file for player 2.")
+    parser.add_argument("player1_file", nargs="?", help="The python file for player 1.")
+    parser.add_argument("player2_file", nargs="?", help="The python file for player 2.")
     
     # Optional arguments with flags
     parser.add_argument("-r", "--rounds", type=int, default=20, 
                         help="Number of rounds to play. Must be an even number. Defaults to 20.")
     parser.add_argument("-s", "--size", type=str, default="2x2", 
                         help="Board size formatted as WIDTHxHEIGHT (e.g., '4x4'). Defaults to '2x2'.")
+    parser.add_argument("-b", "--benchmark", action="store_true",
+                        help="Time every move and print each player's average and slowest move time at the end.")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of rounds to play in parallel worker processes. Defaults to 1. "
+                             "Players with time limits compete for CPU when this is above 1.")
+    parser.add_argument("--json", action="store_true",
+                        help="End the output with the final score as one line of JSON, for scripts such as tournament.py.")
+    parser.add_argument("--serve", action="store_true",
+                        help="Play matches requested on stdin instead of the one given by the arguments (see serve()).")
+
+    args = parser.parse_args(argv)
 
-    args = parser.parse_args()
+    if args.serve:
+        serve()
+        return
+    if args.player2_file is None:
+        parser.error("player1_file and player2_file are required")
 
     # Use the parsed arguments
     player1_file = args.player1_file
@@ -66,10 +140,6 @@ def main():
     except ValueError:
         print("Error: Invalid board size format. Please use WIDTHxHEIGHT (e.g., '4x4').")
         sys.exit(1)
-    
-    if len(sys.argv) < 3 or len(sys.argv) > 7:
-        print("Usage: python ../game_match.py <player1_file.py> <player2_file.py>")
-        sys.exit(1)
 
     try:
         player1 = load_player_module(player1_file)
@@ -78,18 +148,27 @@ def main():
         print(f"Error loading player files: {e}")
         sys.exit(1)
 
-    total_rounds = 20 # change round count here (should be even so that each player starts the same amount of times)
-    board_size = (2, 2) # change board size here
     scores = {player1_file: 0, player2_file: 0, "Draws": 0}
+    move_times = {1: [], 2: []} if args.benchmark else None
 
     print(f"{player1_file} vs {player2_file}")
     
-    for i in range(total_rounds):
-        # alternate who starts each round, first argument player will always go first
-        starting_player = 1 if i % 2 == 0 else 2
-        
-        winner = play_one_round(player1, player2, board_size, starting_player)
-        
+    executor = None
+    if args.jobs > 1:
+        # Rounds are independent, so spread them over worker processes; map() still yields them in order
+        executor = ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_worker,
+                                       initargs=(player1_file, player2_file))
+        round_results = executor.map(_run_worker_round, range(total_rounds),
+                                     [board_size] * total_rounds, [args.benchmark] * total_rounds)
+    else:
+        round_results = (play_indexed_round((player1, player2), i, board_size, args.benchmark)
+                         for i in range(total_rounds))
+
+    for i, (winner, round_move_times) in enumerate(round_results):
+        if move_times is not None:
+            move_times[1].extend(round_move_times[1])
+            move_times[2].extend(round_move_times[2])
+
         round_winner_name = "no one (Draw)"
         if winner == 1:
             scores[player1_file] += 1
@@ -102,10 +181,25 @@ def main():
             
         print(f"Round {i+1}: Winner is {round_winner_name}")
 
+    if executor is not None:
+        executor.shutdown()
+
     print("\nFinal Score:")
     print(f"{player1_file}: {scores[player1_file]} wins")
     print(f"{player2_file}: {scores[player2_file]} wins")
     print(f"Draws: {scores['Draws']}")
 
+    if move_times is not None:
+        print("\nMove Times:")
+        for player_id, player_file in ((1, player1_file), (2, player2_file)):
+            times = move_times[player_id]
+            if times:
+                print(f"{player_file}: {len(times)} moves, "
+                      f"avg {sum(times) / len(times) * 1000:.3f} ms, max {max(times) * 1000:.3f} ms")
+
+    if args.json:
+        print(json.dumps({"p1": player1_file, "p2": player2_file, "p1_wins": scores[player1_file],
+                          "p2_wins": scores[player2_file], "draws": scores["Draws"]}))
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,65 @@
+import random
+
+_tables = {}
+
+def _board_tables(width, height):
+    """Returns (total_h, boxes_for_edge) for a board size, built once and cached.
+
+    Edges are packed into one int, horizontal lines first (bit r*width + c) and then
+    vertical lines (bit total_h + r*(width+1) + c), matching DotsAndBoxesGame's edge ids.
+    boxes_for_edge[edge_id] holds the packed four-side mask of each box the edge borders.
+    """
+    key = (width, height)
+    if key not in _tables:
+        total_h = width * (height + 1)
+        box_masks = {}
+        for r in range(height):
+            for c in range(width):
+                box_masks[(r, c)] = ((1 << (r * width + c)) | (1 << ((r + 1) * width + c)) |
+                                     (1 << (total_h + r * (width + 1) + c)) |
+                                     (1 << (total_h + r * (width + 1) + c + 1)))
+        boxes_for_edge = []
+        for r in range(height + 1):
+            for c in range(width):
+                boxes_for_edge.append(tuple(box_masks[b] for b in ((r - 1, c), (r, c)) if b in box_masks))
+        for r in range(height):
+            for c in range(width + 1):
+                boxes_for_edge.append(tuple(box_masks[b] for b in ((r, c - 1), (r, c)) if b in box_masks))
+        _tables[key] = (total_h, boxes_for_edge)
+    return _tables[key]
+
+def random_rollouts(width, height, h_bits, v_bits, scores, current_player, num_games, rng=random):
+    """Plays num_games uniformly random games to the end from the given position.
+
+    The position is the h_bits/v_bits bitboards from get_state, the (player 1, player 2)
+    scores so far and the player to move. Returns a list with the winner of each game:
+    1, 2, or 0 for a draw.
+    """
+    total_h, boxes_for_edge = _board_tables(width, height)
+    edges = h_bits | (v_bits << total_h)
+    free = [e for e in range(len(boxes_for_edge)) if not (edges >> e) & 1]
+
+    winners = []
+    for _ in range(num_games):
+        # Drawing the free edges in a shuffled order is the same as picking a random move each ply
+        rng.shuffle(free)
+        board = edges
+        player = current_player
+        score = [0, scores[0], scores[1]]
+        for e in free:
+            board |= 1 << e
+            completed = 0
+            for mask in boxes_for_edge[e]:
+                if board & mask == mask:
+                    completed += 1
+            if completed:
+                score[player] += completed
+            else:
+                player = 3 - player
+        if score[1] > score[2]:
+            winners.append(1)
+        elif score[2] > score[1]:
+            winners.append(2)
+        else:
+            winners.append(0)
+    return winners
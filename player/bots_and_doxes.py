@@ -1,6 +1,6 @@
-import copy
+import random
 import time
-from functools import lru_cache
+from collections import namedtuple
 
 # Bots and Doxes - Dots & Boxes AI
 # Implements a depth-limited minimax search with alpha-beta pruning,
@@ -12,10 +12,28 @@ BASE_DEPTH = 4
 # Give the bot more time for deeper search; user said time is not a problem
 TIME_LIMIT = 5.0  # seconds per make_move (best-effort)
 MAX_DEPTH_CAP = 20
-
-# history heuristic for move ordering (simple)
+# how many search nodes to visit between clock reads (power of two)
+TIME_CHECK_NODES = 4096
+# added per unspent ply of search depth to a won final position (subtracted from a lost
+# one), so the search prefers quicker wins and slower losses; small next to any eval term
+TERMINAL_DEPTH_BONUS = 0.001
+# worker processes for the root search; 1 searches in this process only. Above 1, all
+# root moves after the first are searched in parallel (see search_root_parallel). The
+# workers come from fork_pool.py beside game_match.py, and only where processes can fork
+ROOT_WORKERS = 1
+# transposition table slots (power of two), indexed by the low bits of the Zobrist key
+TT_SIZE = 1 << 18
+TT_MASK = TT_SIZE - 1
+# what a stored value means: the exact value, or only a lower/upper bound from an alpha-beta cutoff
+TT_EXACT, TT_LOWER, TT_UPPER = 0, 1, 2
+# width of the null window used to test moves after the first in principal-variation search
+PVS_EPSILON = 1e-6
+# half-width of the root aspiration window, in evaluation units (one box is worth 1)
+ASPIRATION_WINDOW = 1.0
+
+# history heuristic for move ordering (simple): board size -> count per move index
 history_table = {}
-# killer moves per depth for move ordering: map depth -> [mv1, mv2]
+# killer moves for move ordering: board size -> [idx1, idx2] per depth, -1 for none
 killer_moves = {}
 
 # Helper accessors -----------------------------------------------------------
@@ -28,177 +46,335 @@ def get_available_moves(game_state):
     return list(game_state["available_moves"])
 
 
-# Simulation helpers: operate on a lightweight simulated state dict ---------
-# The simulated state has the same keys as game_state but uses mutable sets
-# and tracks current_player and scores to evaluate outcomes.
+# Simulation helpers: operate on a lightweight immutable simulated state -----
+# Lines are int bitboards: horizontal line (r, c) is bit r*width + c of h_lines
+# and vertical line (r, c) is bit r*(width+1) + c of v_lines. Box (r, c) is bit
+# r*width + c of owners1/owners2. s1/s2 are the scores and current_player is the
+# player to move. sides[b] is the number of drawn sides of box b, and n2/n3 count
+# the boxes with exactly 2/3 sides; all three are updated as lines are drawn.
+# key packs one 64-bit Zobrist hash of the drawn lines and the player to move per
+# board symmetry (see canonical_key).
+# Children are built with int arithmetic, nothing else is copied.
+SimState = namedtuple("SimState", "board_size h_lines v_lines owners1 owners2 current_player s1 s2 sides n2 n3 key")
+
+# Lookup tables shared by every state of one board size, built once:
+#   all_moves[i]   move with index i; horizontal moves first (index = h_lines bit),
+#                  then vertical moves (index = total_h + v_lines bit)
+#   move_index     move tuple -> index
+#   move_boxes[i]  ids (r*width + c) of the one or two boxes move i borders
+#   box_masks[b]   (h_mask, v_mask) of the four sides of box b
+#   symmetries     move index permutations of the board's reflections (and rotations on a
+#                  square board), identity first; inverse_symmetries undo them
+#   zobrist[i]     key of move i: 64 bits per symmetry g holding the random key of move
+#                  symmetries[g][i]; zobrist_side is XORed in when player 2 is to move
+#   all_lines      bitboard with the bit of every move index set
+#   not_left_col   box bitboard of every box outside column 0, not_right_col likewise for the last column
+BoardTables = namedtuple("BoardTables", "all_moves move_index move_boxes box_masks total_h symmetries "
+                                        "inverse_symmetries zobrist zobrist_side all_lines not_left_col not_right_col")
+
+ZOBRIST_MASK = (1 << 64) - 1
+
+_board_tables_cache = {}
+
+
+def _symmetry_permutations(width, height, all_moves, move_index):
+    """Move index permutations for the symmetries of a width x height board.
+
+    Each symmetry is a map of the dots (r, c); a line moves to the line between
+    the images of its two dots.
+    """
+    dot_maps = [
+        lambda r, c: (r, c),
+        lambda r, c: (r, width - c),
+        lambda r, c: (height - r, c),
+        lambda r, c: (height - r, width - c),
+    ]
+    if width == height:
+        # rotations and diagonal reflections: transpose first
+        dot_maps += [lambda r, c, m=m: m(c, r) for m in dot_maps]
+    perms = []
+    for dot_map in dot_maps:
+        perm = []
+        for r, c, orientation in all_moves:
+            (r1, c1), (r2, c2) = sorted((dot_map(r, c), dot_map(r + 1, c) if orientation == 'V' else dot_map(r, c + 1)))
+            perm.append(move_index[(r1, c1, 'H' if r1 == r2 else 'V')])
+        perms.append(perm)
+    return perms
+
+
+def canonical_key(keys, count):
+    """Returns (key, g) for a state key packing count per-symmetry Zobrist hashes: the
+    smallest hash and the symmetry g it belongs to. Symmetric positions get the same
+    key, so they share transposition table entries; move indices stored under the
+    key are mapped with symmetries[g] and back with inverse_symmetries[g].
+    """
+    key = keys & ZOBRIST_MASK
+    sym = 0
+    for g in range(1, count):
+        keys >>= 64
+        k = keys & ZOBRIST_MASK
+        if k < key:
+            key, sym = k, g
+    return key, sym
+
+
+def get_board_tables(width, height):
+    tables = _board_tables_cache.get((width, height))
+    if tables is None:
+        all_moves = [(r, c, 'H') for r in range(height + 1) for c in range(width)] + \
+                    [(r, c, 'V') for r in range(height) for c in range(width + 1)]
+        move_boxes = []
+        for r, c, orientation in all_moves:
+            if orientation == 'H':
+                boxes = ((r, c), (r - 1, c))  # below, above
+            else:
+                boxes = ((r, c), (r, c - 1))  # right, left
+            move_boxes.append(tuple(br * width + bc for br, bc in boxes if 0 <= br < height and 0 <= bc < width))
+        box_masks = []
+        for r in range(height):
+            for c in range(width):
+                h_mask = (1 << (r * width + c)) | (1 << ((r + 1) * width + c))
+                v_mask = (1 << (r * (width + 1) + c)) | (1 << (r * (width + 1) + c + 1))
+                box_masks.append((h_mask, v_mask))
+        move_index = {mv: i for i, mv in enumerate(all_moves)}
+        symmetries = _symmetry_permutations(width, height, all_moves, move_index)
+        inverse_symmetries = []
+        for perm in symmetries:
+            inverse = [0] * len(perm)
+            for i, j in enumerate(perm):
+                inverse[j] = i
+            inverse_symmetries.append(inverse)
+        rng = random.Random(width * 1000 + height)
+        keys = [rng.getrandbits(64) for _ in all_moves]
+        zobrist = [sum(keys[perm[i]] << (64 * g) for g, perm in enumerate(symmetries))
+                   for i in range(len(all_moves))]
+        side_key = rng.getrandbits(64)
+        zobrist_side = sum(side_key << (64 * g) for g in range(len(symmetries)))
+        not_left_col = not_right_col = 0
+        for b in range(width * height):
+            if b % width != 0:
+                not_left_col |= 1 << b
+            if b % width != width - 1:
+                not_right_col |= 1 << b
+        tables = BoardTables(all_moves, move_index, move_boxes, box_masks, width * (height + 1),
+                             symmetries, inverse_symmetries, zobrist, zobrist_side,
+                             (1 << len(all_moves)) - 1, not_left_col, not_right_col)
+        _board_tables_cache[(width, height)] = tables
+    return tables
+
 
 def make_sim_state(game_state):
-    state = {
-        "board_size": tuple(game_state["board_size"]),
-        "horizontal_lines": set(game_state["horizontal_lines"]),
-        "vertical_lines": set(game_state["vertical_lines"]),
-        "box_owners": dict(game_state["box_owners"]),
-        "current_player": game_state["your_player_id"],
-        "scores": {1: 0, 2: 0},
-    }
-    # Derive scores from box_owners
-    for owner in state["box_owners"].values():
-        state["scores"][owner] = state["scores"].get(owner, 0) + 1
-    return state
+    width, height = game_state["board_size"]
+    h_lines = 0
+    for (r, c) in game_state["horizontal_lines"]:
+        h_lines |= 1 << (r * width + c)
+    v_lines = 0
+    for (r, c) in game_state["vertical_lines"]:
+        v_lines |= 1 << (r * (width + 1) + c)
+    # Derive owner bitboards and scores from box_owners
+    owners = {1: 0, 2: 0}
+    scores = {1: 0, 2: 0}
+    for (r, c), owner in game_state["box_owners"].items():
+        owners[owner] |= 1 << (r * width + c)
+        scores[owner] += 1
+    tables = get_board_tables(width, height)
+    sides = bytes((h_lines & h_mask).bit_count() + (v_lines & v_mask).bit_count()
+                  for h_mask, v_mask in tables.box_masks)
+    lines = h_lines | (v_lines << tables.total_h)
+    key = tables.zobrist_side if game_state["your_player_id"] == 2 else 0
+    for i, z in enumerate(tables.zobrist):
+        if (lines >> i) & 1:
+            key ^= z
+    return SimState((width, height), h_lines, v_lines, owners[1], owners[2],
+                    game_state["your_player_id"], scores[1], scores[2],
+                    sides, sides.count(2), sides.count(3), key)
+
+
+def is_box_owned_in_state(state, r, c):
+    return ((state.owners1 | state.owners2) >> (r * state.board_size[0] + c)) & 1
 
 
 def is_valid_move_in_state(state, move):
     r, c, orientation = move
-    width, height = state["board_size"]
+    width, height = state.board_size
     if orientation == 'H':
         if not (0 <= r <= height and 0 <= c < width):
             return False
-        return (r, c) not in state["horizontal_lines"]
+        return not (state.h_lines >> (r * width + c)) & 1
     elif orientation == 'V':
         if not (0 <= r < height and 0 <= c <= width):
             return False
-        return (r, c) not in state["vertical_lines"]
+        return not (state.v_lines >> (r * (width + 1) + c)) & 1
     return False
 
 
+def free_lines(state):
+    """Bitboard of the undrawn lines of state, one bit per move index."""
+    tables = get_board_tables(*state.board_size)
+    return tables.all_lines ^ (state.h_lines | (state.v_lines << tables.total_h))
+
+
 def state_get_available_moves(state):
+    all_moves = get_board_tables(*state.board_size).all_moves
+    free = free_lines(state)
     moves = []
-    width, height = state["board_size"]
-    for r in range(height + 1):
-        for c in range(width):
-            if (r, c) not in state["horizontal_lines"]:
-                moves.append((r, c, 'H'))
-    for r in range(height):
-        for c in range(width + 1):
-            if (r, c) not in state["vertical_lines"]:
-                moves.append((r, c, 'V'))
+    while free:
+        lsb = free & -free
+        free ^= lsb
+        moves.append(all_moves[lsb.bit_length() - 1])
     return moves
 
 
 def _is_box_complete_in_state(state, r, c):
-    top = (r, c) in state["horizontal_lines"]
-    bottom = (r + 1, c) in state["horizontal_lines"]
-    left = (r, c) in state["vertical_lines"]
-    right = (r, c + 1) in state["vertical_lines"]
-    return top and bottom and left and right
+    return state.sides[r * state.board_size[0] + c] == 4
 
 
 def apply_move_to_state(state, move):
     """
-    Applies move to a copied state and returns (new_state, boxes_completed, next_player)
+    Applies move and returns (new_state, boxes_completed, next_player)
     """
     if not is_valid_move_in_state(state, move):
         raise ValueError("Applying invalid move to simulated state: {}".format(move))
+    return apply_move_unchecked(state, move)
 
-    new_state = {
-        "board_size": state["board_size"],
-        "horizontal_lines": set(state["horizontal_lines"]),
-        "vertical_lines": set(state["vertical_lines"]),
-        "box_owners": dict(state["box_owners"]),
-        "current_player": state["current_player"],
-        "scores": dict(state["scores"]),
-    }
-
-    r, c, orientation = move
-    width, height = new_state["board_size"]
 
-    if orientation == 'H':
-        new_state["horizontal_lines"].add((r, c))
+def apply_move_unchecked(state, move):
+    """
+    apply_move_to_state without the validity check, for the search's inner loops
+    where every move comes from state_get_available_moves of the same state.
+    """
+    tables = get_board_tables(*state.board_size)
+    idx = tables.move_index[move]
+    h_lines = state.h_lines
+    v_lines = state.v_lines
+    if idx < tables.total_h:
+        h_lines |= 1 << idx
     else:
-        new_state["vertical_lines"].add((r, c))
+        v_lines |= 1 << (idx - tables.total_h)
 
+    # update the side counts of the affected boxes; a box reaching 4 is completed
+    sides = bytearray(state.sides)
+    n2, n3 = state.n2, state.n3
     boxes_completed = 0
-
-    # check potentially affected boxes
-    if orientation == 'H':
-        # box below
-        if r < height and _is_box_complete_in_state(new_state, r, c):
-            new_state["box_owners"][(r, c)] = new_state["current_player"]
-            boxes_completed += 1
-        # box above
-        if r > 0 and _is_box_complete_in_state(new_state, r - 1, c):
-            new_state["box_owners"][(r - 1, c)] = new_state["current_player"]
-            boxes_completed += 1
-    else:  # 'V'
-        # box right
-        if c < width and _is_box_complete_in_state(new_state, r, c):
-            new_state["box_owners"][(r, c)] = new_state["current_player"]
-            boxes_completed += 1
-        # box left
-        if c > 0 and _is_box_complete_in_state(new_state, r, c - 1):
-            new_state["box_owners"][(r, c - 1)] = new_state["current_player"]
+    completed_bits = 0
+    for box in tables.move_boxes[idx]:
+        new = sides[box] + 1
+        sides[box] = new
+        if new == 2:
+            n2 += 1
+        elif new == 3:
+            n2 -= 1
+            n3 += 1
+        elif new == 4:
+            n3 -= 1
+            completed_bits |= 1 << box
             boxes_completed += 1
 
+    player = state.current_player
+    owners1, owners2, s1, s2 = state.owners1, state.owners2, state.s1, state.s2
+    key = state.key ^ tables.zobrist[idx]
     if boxes_completed > 0:
-        new_state["scores"][new_state["current_player"]] = new_state["scores"].get(new_state["current_player"], 0) + boxes_completed
-        next_player = new_state["current_player"]
+        if player == 1:
+            owners1 |= completed_bits
+            s1 += boxes_completed
+        else:
+            owners2 |= completed_bits
+            s2 += boxes_completed
+        next_player = player
     else:
-        next_player = 3 - new_state["current_player"]
-        new_state["current_player"] = next_player
+        next_player = 3 - player
+        key ^= tables.zobrist_side
 
+    new_state = SimState(state.board_size, h_lines, v_lines, owners1, owners2, next_player, s1, s2,
+                         bytes(sides), n2, n3, key)
     return new_state, boxes_completed, next_player
 
 
 def resolve_all_forced_captures(state):
     """Simulate all forced captures (3-sided boxes) greedily until none remain.
-    Returns a new state after all immediate captures are resolved."""
-    st = {
-        "board_size": state["board_size"],
-        "horizontal_lines": set(state["horizontal_lines"]),
-        "vertical_lines": set(state["vertical_lines"]),
-        "box_owners": dict(state["box_owners"]),
-        "current_player": state["current_player"],
-        "scores": dict(state["scores"]),
-    }
-    while True:
-        comps = find_completable_boxes_in_state(st)
-        if not comps:
-            break
-        # pick a capture move that completes at least one box (prefer multi-box)
-        best_mv = None
-        best_boxes = -1
-        moves = state_get_available_moves(st)
-        for mv in moves:
-            r, c, orientation = mv
-            boxes = 0
-            if orientation == 'H':
-                if r < st['board_size'][1] and count_box_sides_in_state(st, r, c) == 3:
-                    boxes += 1
-                if r > 0 and count_box_sides_in_state(st, r - 1, c) == 3:
-                    boxes += 1
-            else:
-                if c < st['board_size'][0] and count_box_sides_in_state(st, r, c) == 3:
-                    boxes += 1
-                if c > 0 and count_box_sides_in_state(st, r, c - 1) == 3:
-                    boxes += 1
-            if boxes > best_boxes:
-                best_boxes = boxes
-                best_mv = mv
-        if best_mv is None or best_boxes == 0:
-            break
-        st, _, _ = apply_move_to_state(st, best_mv)
+    Returns the state after all immediate captures are resolved.
+
+    Works from a worklist of 3-sided boxes: taking a box can only make the box on
+    the other side of the drawn line 3-sided, so only that neighbour is re-checked.
+    """
+    tables = get_board_tables(*state.board_size)
+    masks = tables.box_masks
+    st = state
+    worklist = [b for b, n in enumerate(st.sides) if n == 3]
+    while worklist:
+        box = worklist.pop()
+        h_mask, v_mask = masks[box]
+        missing_h = h_mask ^ (st.h_lines & h_mask)
+        missing_v = v_mask ^ (st.v_lines & v_mask)
+        if missing_h:
+            if missing_v or missing_h & (missing_h - 1):
+                continue
+            idx = missing_h.bit_length() - 1
+        elif missing_v and not missing_v & (missing_v - 1):
+            idx = tables.total_h + missing_v.bit_length() - 1
+        else:
+            continue  # already taken while resolving an earlier box
+        st, _, _ = apply_move_unchecked(st, tables.all_moves[idx])
+        for neighbour in tables.move_boxes[idx]:
+            if neighbour != box and st.sides[neighbour] == 3:
+                worklist.append(neighbour)
     return st
 
 
+def order_moves(state, pv, killers):
+    """Yields the available moves of state in search order: the PV move, the killer
+    moves, moves completing a 3-sided box, then the rest in generation order.
+    pv and killers are move indices, -1 for none.
+
+    Each stage is only worked out once the previous ones are used up, so a node that
+    cuts off early never enumerates the remaining moves.
+    """
+    tables = get_board_tables(*state.board_size)
+    free = free_lines(state)
+    for idx in (pv, *killers):
+        if idx >= 0:
+            bit = 1 << idx
+            if free & bit:
+                free ^= bit
+                yield tables.all_moves[idx]
+    if state.n3:
+        for box, n in enumerate(state.sides):
+            if n == 3:
+                h_mask, v_mask = tables.box_masks[box]
+                missing = (h_mask ^ (state.h_lines & h_mask)) | \
+                          ((v_mask ^ (state.v_lines & v_mask)) << tables.total_h)
+                if free & missing:
+                    free ^= missing
+                    yield tables.all_moves[missing.bit_length() - 1]
+    while free:
+        lsb = free & -free
+        free ^= lsb
+        yield tables.all_moves[lsb.bit_length() - 1]
+
+
 # Heuristics and evaluation --------------------------------------------------
 
 def count_box_sides_in_state(state, r, c):
+    return state.sides[r * state.board_size[0] + c]
+
+
+def count_adjacent_boxes_with_sides(state, move, sides):
+    """Number of boxes bordering move that currently have exactly `sides` sides drawn."""
+    tables = get_board_tables(*state.board_size)
     count = 0
-    if (r, c) in state["horizontal_lines"]: count += 1
-    if (r + 1, c) in state["horizontal_lines"]: count += 1
-    if (r, c) in state["vertical_lines"]: count += 1
-    if (r, c + 1) in state["vertical_lines"]: count += 1
+    for box in tables.move_boxes[tables.move_index[move]]:
+        if state.sides[box] == sides:
+            count += 1
     return count
 
 
+def count_boxes_completed_by_move(state, move):
+    return count_adjacent_boxes_with_sides(state, move, 3)
+
+
 def find_completable_boxes_in_state(state):
-    width, height = state["board_size"]
-    comps = []
-    for r in range(height):
-        for c in range(width):
-            if (r, c) not in state["box_owners"] and count_box_sides_in_state(state, r, c) == 3:
-                comps.append((r, c))
-    return comps
+    width = state.board_size[0]
+    return [divmod(box, width) for box, n in enumerate(state.sides) if n == 3]
 
 
 def evaluate_state(state, my_id):
@@ -206,69 +382,63 @@ def evaluate_state(state, my_id):
     Evaluation function (higher is better for my_id). Combines immediate score diff,
     potential captures (3-side boxes), and penalties for giving opponent moves.
     """
-    opp = 3 - my_id
-    score = state["scores"].get(my_id, 0) - state["scores"].get(opp, 0)
+    score = state.s1 - state.s2 if my_id == 1 else state.s2 - state.s1
+    remaining = free_lines(state).bit_count()
+    if not remaining:
+        # finished game: the score difference is exact, the heuristics below don't apply
+        return score
 
-    # value of imminent captures
-    comps = find_completable_boxes_in_state(state)
+    # value of imminent captures (boxes with 3 sides; owned boxes have all 4)
     # if it's my turn, these are positive; otherwise they are negative for me
-    turn_multiplier = 1 if state["current_player"] == my_id else -1
-    score += 0.9 * len(comps) * turn_multiplier
+    turn_multiplier = 1 if state.current_player == my_id else -1
+    score += 0.9 * state.n3 * turn_multiplier
 
     # penalty for number of 2-sided boxes (they indicate chains forming that can be dangerous)
-    width, height = state["board_size"]
-    two_sided = 0
-    for r in range(height):
-        for c in range(width):
-            if (r, c) not in state["box_owners"] and count_box_sides_in_state(state, r, c) == 2:
-                two_sided += 1
+    width, height = state.board_size
     # make this penalty stronger so we aggressively avoid creating chains greedy can exploit
-    score -= 0.45 * two_sided
+    score -= 0.45 * state.n2
 
     # small tie-breaker favoring center-ish moves by number of remaining moves
-    remaining = len(state_get_available_moves(state))
     score += 0.01 * ( (width * height * 4) - remaining )
 
     # parity-aware chain estimation (more accurate than raw chain_sum)
     score += parity_chain_value(state, my_id)
 
-    # mobility: fewer opponent moves is slightly better
-    opp = 3 - my_id
-    # count opponent moves by simulating a no-capture single-step opponent move count
-    # (cheap approximation): if opponent is next, use current available; otherwise estimate after one move
-    avail = len(state_get_available_moves(state))
-    score -= 0.02 * avail
+    # mobility: fewer opponent moves is slightly better; the moves left stand in for them
+    score -= 0.02 * remaining
 
     return score
 
 
 def find_chains_in_state(state):
     """Find connected components of boxes with exactly 2 sides (simple chain detection).
-    Returns a list of chain lengths."""
-    width, height = state["board_size"]
-    visited = set()
+    Returns a list of chain lengths.
+
+    The 2-sided boxes are a bitboard (bit r*width + c; owned boxes have 4 sides, so
+    they never appear). Each component grows from its lowest box by shifting it one
+    box up, down, left and right until it stops changing.
+    """
+    width = state.board_size[0]
+    tables = get_board_tables(*state.board_size)
+    sides = state.sides
+    open_boxes = 0
+    box = sides.find(2)
+    while box != -1:
+        open_boxes |= 1 << box
+        box = sides.find(2, box + 1)
+    to_right = open_boxes & tables.not_left_col
+    to_left = open_boxes & tables.not_right_col
     chains = []
-    for r in range(height):
-        for c in range(width):
-            if (r, c) in visited:
-                continue
-            if (r, c) in state["box_owners"]:
-                continue
-            if count_box_sides_in_state(state, r, c) != 2:
-                continue
-            # BFS
-            stack = [(r, c)]
-            visited.add((r, c))
-            length = 0
-            while stack:
-                br, bc = stack.pop()
-                length += 1
-                # neighbors: up/down/left/right
-                for nr, nc in ((br-1, bc), (br+1, bc), (br, bc-1), (br, bc+1)):
-                    if 0 <= nr < height and 0 <= nc < width and (nr, nc) not in visited and (nr, nc) not in state["box_owners"] and count_box_sides_in_state(state, nr, nc) == 2:
-                        visited.add((nr, nc))
-                        stack.append((nr, nc))
-            chains.append(length)
+    while open_boxes:
+        chain = open_boxes & -open_boxes
+        while True:
+            grown = (chain | ((chain << width | chain >> width) & open_boxes) |
+                     (chain << 1 & to_right) | (chain >> 1 & to_left))
+            if grown == chain:
+                break
+            chain = grown
+        open_boxes ^= chain
+        chains.append(chain.bit_count())
     return chains
 
 
@@ -286,7 +456,7 @@ def parity_chain_value(state, my_id):
     for L in chains:
         val = (L + 1) // 2  # parity value approximation
         # if opponent to move, this favors us (they may be forced to open)
-        if state["current_player"] == my_id:
+        if state.current_player == my_id:
             total -= val
         else:
             total += val
@@ -295,21 +465,141 @@ def parity_chain_value(state, my_id):
     return 0.9 * total
 
 
-# Transposition table key ---------------------------------------------------
+# Minimax with alpha-beta and transposition table ---------------------------
 
-def make_tt_key(state):
-    return (
-        state["current_player"],
-        tuple(sorted(state["horizontal_lines"])),
-        tuple(sorted(state["vertical_lines"]))
-    )
+def root_move_priority(state, move, history):
+    """Sort key for the root moves: moves completing boxes first, then moves leaving
+    the opponent the fewest 3-sided boxes, then moves with a higher history score."""
+    completed = count_boxes_completed_by_move(state, move)
+    ns, _, _ = apply_move_unchecked(state, move)
+    # every move leaves the opponent the same number of replies, so only the
+    # 3-sided boxes it hands over tell the moves apart
+    return (-completed, ns.n3, -history[get_board_tables(*state.board_size).move_index[move]])
+
+
+def make_search(board_size, my_id, start_time, time_limit, max_depth):
+    """Builds a negamax search with its own transposition table and returns
+    search_child(state, child, depth_left, alpha, beta): the value of child, reached by
+    one move from state, for the player to move in state. Values are evaluate_state
+    scores for my_id, negated when the opponent is to move. Raises TimeoutError once
+    time_limit seconds have passed since start_time.
+    """
+    width, height = board_size
+    # fixed-size transposition table: slot key & TT_MASK holds (key, value, depth, best_move, bound),
+    # keyed by canonical_key with best_move as a move index in the canonical orientation (-1 for none)
+    tt = [None] * TT_SIZE
+    tables = get_board_tables(width, height)
+    move_index = tables.move_index
+    symmetries, inverse_symmetries = tables.symmetries, tables.inverse_symmetries
+    n_symmetries = len(symmetries)
+    nodes = [0]
+    killers = killer_moves.setdefault((width, height), [])
+    while len(killers) <= max_depth:
+        killers.append([-1, -1])
+    # line bitboards of a finished game
+    full_h = (1 << (width * (height + 1))) - 1
+    full_v = (1 << (height * (width + 1))) - 1
+
+    def store_tt_entry(key, sym, value, score_diff, depth_left, best_move, alpha_orig, beta_orig):
+        if value <= alpha_orig:
+            bound = TT_UPPER
+        elif value >= beta_orig:
+            bound = TT_LOWER
+        else:
+            bound = TT_EXACT
+        if best_move >= 0:
+            best_move = symmetries[sym][best_move]
+        tt[key & TT_MASK] = (key, value - score_diff, depth_left, best_move, bound)
+
+    # Inner recursive negamax: values are from the point of view of the player to move
+    # in `state`. A capture keeps the turn, so a child's value is only negated (and its
+    # window flipped) when the child has the other player to move.
+    def search_child(state, child, depth_left, alpha, beta):
+        if child.current_player == state.current_player:
+            return negamax(child, depth_left, alpha, beta)
+        return -negamax(child, depth_left, -beta, -alpha)
+
+    def negamax(state, depth_left, alpha, beta):
+        # time cutoff, checked every TIME_CHECK_NODES nodes
+        nodes[0] += 1
+        if not nodes[0] & (TIME_CHECK_NODES - 1) and time.time() - start_time > time_limit:
+            # raise to bubble up the timeout
+            raise TimeoutError()
 
+        # The key covers lines and player to move but not who owns which box. Everything
+        # but the current score difference follows from those, so entries store values
+        # relative to it and positions reached with different captures share entries.
+        score_diff = state.s1 - state.s2 if state.current_player == 1 else state.s2 - state.s1
+        if state.h_lines == full_h and state.v_lines == full_v:
+            # game over: the exact final margin, nudged towards quicker wins and slower losses
+            return score_diff + TERMINAL_DEPTH_BONUS * depth_left * ((score_diff > 0) - (score_diff < 0))
+        key, sym = canonical_key(state.key, n_symmetries)
+        entry = tt[key & TT_MASK]
+        if entry is not None and entry[0] != key:
+            entry = None  # slot holds a different position
+        if entry is not None and entry[2] >= depth_left:
+            # reuse stored value, or tighten the window with a stored bound
+            stored_value, bound = entry[1] + score_diff, entry[4]
+            if bound == TT_EXACT:
+                return stored_value
+            if bound == TT_LOWER:
+                alpha = max(alpha, stored_value)
+            else:
+                beta = min(beta, stored_value)
+            if alpha >= beta:
+                return stored_value
+        alpha_orig, beta_orig = alpha, beta
+
+        # evaluate_state scores for my_id; flip it when the opponent is to move
+        sign = 1 if state.current_player == my_id else -1
+        if depth_left == 0:
+            # quiescence: resolve forced captures before evaluation
+            resolved = resolve_all_forced_captures(state)
+            val = sign * evaluate_state(resolved, my_id)
+            tt[key & TT_MASK] = (key, val - score_diff, depth_left, -1, TT_EXACT)
+            return val
+
+        # Principal-variation search: the first move (TT move if any) gets the full window,
+        # the rest a null window that only asks whether they beat alpha; a move that does
+        # is searched again with the full window.
+        pv = -1
+        if entry is not None and entry[3] >= 0:
+            pv = inverse_symmetries[sym][entry[3]]
+        value = float('-inf')
+        best_local_move = None
+        first = True
+        for mv in order_moves(state, pv, killers[depth_left]):
+            child, boxes, _ = apply_move_unchecked(state, mv)
+            # if capture occurred, keep depth (extra turn doesn't consume search depth)
+            next_depth = depth_left if boxes > 0 else depth_left - 1
+            if first:
+                v = search_child(state, child, next_depth, alpha, beta)
+                first = False
+            else:
+                v = search_child(state, child, next_depth, alpha, alpha + PVS_EPSILON)
+                if alpha < v < beta:
+                    v = search_child(state, child, next_depth, alpha, beta)
+            if v > value:
+                value = v
+                best_local_move = mv
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                # cutoff -> record killer move
+                km = killers[depth_left]
+                idx = move_index[mv]
+                if idx != km[0] and idx != km[1]:
+                    km[1] = km[0]
+                    km[0] = idx
+                break
+        store_tt_entry(key, sym, value, score_diff, depth_left, move_index[best_local_move] if best_local_move else pv, alpha_orig, beta_orig)
+        return value
+
+    return search_child
 
-# Minimax with alpha-beta and transposition table ---------------------------
 
 def find_best_move_with_minimax(root_state, my_id, time_limit=TIME_LIMIT):
     start_time = time.time()
-    width, height = root_state["board_size"]
+    width, height = root_state.board_size
     area = width * height
     # choose max depth heuristically by board area; iterative deepening will use this as cap
     max_depth = BASE_DEPTH
@@ -321,7 +611,8 @@ def find_best_move_with_minimax(root_state, my_id, time_limit=TIME_LIMIT):
         max_depth = 10
     max_depth = min(max_depth, MAX_DEPTH_CAP)
 
-    tt = {}
+    move_index = get_board_tables(width, height).move_index
+    history = history_table.setdefault((width, height), [0] * len(move_index))
     best_move = None
     best_val = float('-inf')
 
@@ -330,210 +621,109 @@ def find_best_move_with_minimax(root_state, my_id, time_limit=TIME_LIMIT):
         return None
 
     # Order moves: prefer those that complete boxes (quick heuristic)
-    def move_priority(move):
-        r, c, orientation = move
-        # emulate without copying heavy state: quick check
-        temp_state = root_state
-        # check if move completes box
-        completed = 0
-        if orientation == 'H':
-            if r < height and count_box_sides_in_state(temp_state, r, c) == 3: completed += 1
-            if r > 0 and count_box_sides_in_state(temp_state, r - 1, c) == 3: completed += 1
-        else:
-            if c < width and count_box_sides_in_state(temp_state, r, c) == 3: completed += 1
-            if c > 0 and count_box_sides_in_state(temp_state, r, c - 1) == 3: completed += 1
-        # reduction in opponent options metric
-        # simulate applying the move quickly
-        try:
-            ns, boxes, _ = apply_move_to_state(root_state, move)
-            opp_next_moves = len(state_get_available_moves(ns))
-        except Exception:
-            opp_next_moves = 999
-
-        hist_score = history_table.get((move), 0)
-
-        # penalize moves that create 3-sided boxes for opponent after our move (very bad)
+    moves.sort(key=lambda mv: root_move_priority(root_state, mv, history))
+
+    search_child = make_search(root_state.board_size, my_id, start_time, time_limit, max_depth)
+
+    pool = None
+    if ROOT_WORKERS > 1 and len(moves) > 1:
+        pool = start_root_pool(lambda mv, depth, alpha, beta: search_root_move(
+            root_state, my_id, mv, depth, alpha, beta, start_time, time_limit, max_depth))
+
+    # Evaluate root moves with principal-variation search inside [alpha, beta].
+    # Returns (best move, its value); the value is only a bound when it falls
+    # outside the window, and the move is None if time ran out before any move.
+    def search_root(depth, alpha, beta):
+        cur_best = None
+        cur_best_val = float('-inf')
+        # use same ordering
+        for i, mv in enumerate(moves):
+            if time.time() - start_time > time_limit:
+                break
+            if pool is not None and cur_best is not None and depth > 1:
+                return search_root_parallel(depth, alpha, beta, cur_best, cur_best_val, moves[i:])
+            new_state, boxes, _ = apply_move_unchecked(root_state, mv)
+            next_depth = depth - 1 if boxes == 0 else depth
+            if cur_best is None:
+                val = search_child(root_state, new_state, next_depth, alpha, beta)
+            else:
+                a = max(alpha, cur_best_val)
+                val = search_child(root_state, new_state, next_depth, a, a + PVS_EPSILON)
+                if a < val < beta:
+                    val = search_child(root_state, new_state, next_depth, a, beta)
+            if val > cur_best_val or cur_best is None:
+                cur_best_val = val
+                cur_best = mv
+            if cur_best_val >= beta:
+                break
+        return cur_best, cur_best_val
+
+    # Young Brothers Wait: once the first root move has set a value, the remaining moves
+    # are tested against it with null windows in the worker processes (each with its own
+    # TT), and any move that beats it is searched again here with the full window.
+    def search_root_parallel(depth, alpha, beta, cur_best, cur_best_val, rest):
+        a = max(alpha, cur_best_val)
+        futures = [pool.submit_task(mv, depth, a, a + PVS_EPSILON) for mv in rest]
         try:
-            ns2, b2, _ = apply_move_to_state(root_state, move)
-            # count 3-side boxes that opponent would get immediately (i.e., boxes with 3 sides after our move)
-            opp_threes = 0
-            for rr in range(ns2['board_size'][1]):
-                for cc in range(ns2['board_size'][0]):
-                    if (rr, cc) not in ns2['box_owners'] and count_box_sides_in_state(ns2, rr, cc) == 3:
-                        opp_threes += 1
-        except Exception:
-            opp_threes = 0
-
-        # Higher completed -> higher priority, fewer opp moves -> higher priority, but huge penalty for opp threes
-        return (-completed, opp_next_moves, opp_threes, -hist_score)
-
-    moves.sort(key=move_priority)
-
-    # inner recursive minimax
-    def minimax(state, depth_left, alpha, beta, maximizing, my_id):
-        # time cutoff
-        if time.time() - start_time > time_limit:
-            # raise to bubble up the timeout
-            raise TimeoutError()
-
-        key = make_tt_key(state)
-        if key in tt and tt[key]["depth"] >= depth_left:
-            # reuse stored value
-            return tt[key]["value"]
-
-        # quiescence: if there are immediate captures, resolve them before evaluating/branching
-        avail = state_get_available_moves(state)
-        if not avail:
-            val = evaluate_state(state, my_id)
-            tt[key] = {"value": val, "depth": depth_left}
-            return val
-
-        if depth_left == 0:
-            # resolve forced captures before evaluation
-            resolved = resolve_all_forced_captures(state)
-            val = evaluate_state(resolved, my_id)
-            tt[key] = {"value": val, "depth": depth_left}
-            return val
-
-        if maximizing:
-            value = float('-inf')
-            # order moves: try TT/PV move first, then killer moves for this depth, then captures, then history
-            pv_move = tt.get(key, {}).get("best_move") if key in tt else None
-            kmoves = killer_moves.get(depth_left, [])
-            def move_order_key(mv):
-                r,c,o = mv
-                score = 0
-                if pv_move is not None and mv == pv_move:
-                    score -= 10000
-                if mv in kmoves:
-                    score -= 5000
-                # prefer captures
-                b = 0
-                if o == 'H':
-                    if r < state['board_size'][1] and count_box_sides_in_state(state,r,c) == 3: b += 1
-                    if r > 0 and count_box_sides_in_state(state,r-1,c) == 3: b += 1
-                else:
-                    if c < state['board_size'][0] and count_box_sides_in_state(state,r,c) == 3: b += 1
-                    if c > 0 and count_box_sides_in_state(state,r,c-1) == 3: b += 1
-                score -= b*100
-                # history heuristic (prefer moves with higher history_table)
-                score -= history_table.get(mv,0)
-                return score
-
-            ordered_avail = sorted(avail, key=move_order_key)
-            best_local_move = None
-            for mv in ordered_avail:
-                new_state, boxes, _ = apply_move_to_state(state, mv)
-                next_maximizing = (new_state["current_player"] == my_id)
-                # if capture occurred, keep depth (extra turn doesn't consume search depth)
-                next_depth = depth_left if boxes > 0 else depth_left - 1
-                v = minimax(new_state, next_depth, alpha, beta, next_maximizing, my_id)
-                if v > value:
-                    value = v
-                    best_local_move = mv
-                alpha = max(alpha, value)
-                if alpha >= beta:
-                    # beta cutoff -> record killer move
-                    km = killer_moves.setdefault(depth_left, [])
-                    if mv not in km:
-                        km.insert(0, mv)
-                        if len(km) > 2:
-                            km.pop()
-                    break
-            tt[key] = {"value": value, "depth": depth_left, "best_move": best_local_move or tt.get(key,{}).get("best_move", None)}
-            return value
-        else:
-            value = float('inf')
-            pv_move = tt.get(key, {}).get("best_move") if key in tt else None
-            kmoves = killer_moves.get(depth_left, [])
-            def move_order_key2(mv):
-                r,c,o = mv
-                score = 0
-                if pv_move is not None and mv == pv_move:
-                    score -= 10000
-                if mv in kmoves:
-                    score -= 5000
-                # prefer captures
-                b = 0
-                if o == 'H':
-                    if r < state['board_size'][1] and count_box_sides_in_state(state,r,c) == 3: b += 1
-                    if r > 0 and count_box_sides_in_state(state,r-1,c) == 3: b += 1
-                else:
-                    if c < state['board_size'][0] and count_box_sides_in_state(state,r,c) == 3: b += 1
-                    if c > 0 and count_box_sides_in_state(state,r,c-1) == 3: b += 1
-                score -= b*100
-                score -= history_table.get(mv,0)
-                return score
-
-            ordered_avail = sorted(avail, key=move_order_key2)
-            best_local_move = None
-            for mv in ordered_avail:
-                new_state, boxes, _ = apply_move_to_state(state, mv)
-                next_maximizing = (new_state["current_player"] == my_id)
-                next_depth = depth_left if boxes > 0 else depth_left - 1
-                v = minimax(new_state, next_depth, alpha, beta, next_maximizing, my_id)
-                if v < value:
-                    value = v
-                    best_local_move = mv
-                beta = min(beta, value)
-                if alpha >= beta:
-                    # record killer
-                    km = killer_moves.setdefault(depth_left, [])
-                    if mv not in km:
-                        km.insert(0, mv)
-                        if len(km) > 2:
-                            km.pop()
+            for mv, future in zip(rest, futures):
+                val = future.result()
+                if val is None:
+                    break  # the worker ran out of time
+                if val <= a:
+                    continue
+                new_state, boxes, _ = apply_move_unchecked(root_state, mv)
+                next_depth = depth - 1 if boxes == 0 else depth
+                val = search_child(root_state, new_state, next_depth, max(alpha, cur_best_val), beta)
+                if val > cur_best_val:
+                    cur_best_val = val
+                    cur_best = mv
+                if cur_best_val >= beta:
                     break
-            tt[key] = {"value": value, "depth": depth_left, "best_move": best_local_move or tt.get(key,{}).get("best_move", None)}
-            return value
-
-    # Evaluate root moves with alpha-beta
-    # Iterative deepening loop
+        finally:
+            for future in futures:
+                future.cancel()
+        return cur_best, cur_best_val
+
+    # Iterative deepening loop. Each depth after the first starts with an aspiration
+    # window around the previous depth's value; a result outside it is searched again
+    # with that side of the window opened up.
     try:
         for d in range(1, max_depth + 1):
             # stop if time nearly up
             if time.time() - start_time > time_limit:
                 break
-            cur_best = None
-            cur_best_val = float('-inf')
-            # use same ordering
-            for mv in moves:
-                if time.time() - start_time > time_limit:
+            if best_move is None:
+                alpha, beta = float('-inf'), float('inf')
+            else:
+                alpha, beta = best_val - ASPIRATION_WINDOW, best_val + ASPIRATION_WINDOW
+            while True:
+                cur_best, cur_best_val = search_root(d, alpha, beta)
+                if cur_best is None:
+                    break
+                if cur_best_val <= alpha:
+                    alpha = float('-inf')
+                elif cur_best_val >= beta:
+                    beta = float('inf')
+                else:
+                    # accept cur_best
+                    best_move = cur_best
+                    best_val = cur_best_val
+                    # update history heuristic to prefer this move next time
+                    history[move_index[cur_best]] += 1
                     break
-                if not is_valid_move_in_state(root_state, mv):
-                    continue
-                new_state, boxes, _ = apply_move_to_state(root_state, mv)
-                maximizing = (new_state["current_player"] == my_id)
-                next_depth = d - 1 if boxes == 0 else d
-                val = minimax(new_state, next_depth, float('-inf'), float('inf'), maximizing, my_id)
-                if val > cur_best_val or cur_best is None:
-                    cur_best_val = val
-                    cur_best = mv
-            # accept cur_best if found
-            if cur_best is not None:
-                best_move = cur_best
-                best_val = cur_best_val
-                # update history heuristic to prefer this move next time
-                history_table[cur_best] = history_table.get(cur_best, 0) + 1
     except TimeoutError:
         # timed out; return best found so far
         pass
+    finally:
+        if pool is not None:
+            pool.shutdown()
 
     # If we didn't find anything with minimax or timed out, fallback heuristics
     if best_move is None:
         # Try to find any completions
         for mv in moves:
-            r, c, orientation = mv
-            if orientation == 'H':
-                if r < height and count_box_sides_in_state(root_state, r, c) == 3:
-                    return mv
-                if r > 0 and count_box_sides_in_state(root_state, r - 1, c) == 3:
-                    return mv
-            else:
-                if c < width and count_box_sides_in_state(root_state, r, c) == 3:
-                    return mv
-                if c > 0 and count_box_sides_in_state(root_state, r, c - 1) == 3:
-                    return mv
+            if count_boxes_completed_by_move(root_state, mv):
+                return mv
 
         # otherwise choose the move that looks safest
         for mv in moves:
@@ -545,21 +735,30 @@ def find_best_move_with_minimax(root_state, my_id, time_limit=TIME_LIMIT):
     return best_move
 
 
+# Parallel root search -------------------------------------------------------
+
+def start_root_pool(task):
+    """ROOT_WORKERS forked processes running task for one search, or None where processes
+    can't fork, in which case the search runs in this process only."""
+    # Imported here so the file still stands alone while ROOT_WORKERS is 1
+    from fork_pool import ForkPool, available
+    return ForkPool(ROOT_WORKERS, task) if available() else None
+
+
+def search_root_move(root_state, my_id, move, depth, alpha, beta, start_time, time_limit, max_depth):
+    """Worker side of the parallel root search: the value for my_id of playing move in
+    root_state, searched depth plies deep within [alpha, beta], or None on timeout."""
+    search_child = make_search(root_state.board_size, my_id, start_time, time_limit, max_depth)
+    new_state, boxes, _ = apply_move_unchecked(root_state, move)
+    try:
+        return search_child(root_state, new_state, depth - 1 if boxes == 0 else depth, alpha, beta)
+    except TimeoutError:
+        return None
+
+
 # Safety check used in fallback: avoid creating 3-side boxes for opponent
 def is_safe_move_in_root(state, move):
-    r, c, orientation = move
-    width, height = state["board_size"]
-    if orientation == 'H':
-        if r < height and count_box_sides_in_state(state, r, c) == 2:
-            return False
-        if r > 0 and count_box_sides_in_state(state, r - 1, c) == 2:
-            return False
-    else:
-        if c < width and count_box_sides_in_state(state, r, c) == 2:
-            return False
-        if c > 0 and count_box_sides_in_state(state, r, c - 1) == 2:
-            return False
-    return True
+    return count_adjacent_boxes_with_sides(state, move, 2) == 0
 
 
 # Public API required by the tournament runner -------------------------------
@@ -576,10 +775,8 @@ def make_move(game_state):
         # but to avoid invalid move, raise or return arbitrary first move if present
         raise RuntimeError("No available moves in game_state")
 
-    # Build a lightweight simulated state for search
+    # Build a lightweight simulated state for search; current_player is the runner's provided id
     root_state = make_sim_state(game_state)
-    # override the simulated current_player to match runner's provided id
-    root_state["current_player"] = game_state["your_player_id"]
 
     # Try timeout-aware minimax search
     try:
@@ -592,17 +789,8 @@ def make_move(game_state):
     if mv is None or mv not in available:
         # Try to pick a completions move first
         for candidate in available:
-            r, c, orientation = candidate
-            if orientation == 'H':
-                if r < root_state['board_size'][1] and count_box_sides_in_state(root_state, r, c) == 3:
-                    return candidate
-                if r > 0 and count_box_sides_in_state(root_state, r - 1, c) == 3:
-                    return candidate
-            else:
-                if c < root_state['board_size'][0] and count_box_sides_in_state(root_state, r, c) == 3:
-                    return candidate
-                if c > 0 and count_box_sides_in_state(root_state, r, c - 1) == 3:
-                    return candidate
+            if count_boxes_completed_by_move(root_state, candidate):
+                return candidate
 
         # pick any safe available move
         for candidate in available:
@@ -4,7 +4,9 @@ from __future__ import annotations
 
 import math
 import random
-from typing import List, Tuple, Dict, Optional
+from array import array
+from collections import OrderedDict
+from typing import Callable, List, Tuple, Dict, Optional
 
 # ----- Constants (as in JS) -----
 DEADEND = -1
@@ -12,6 +14,46 @@ REMOVED = -2
 EATLOONEY = 10000001
 GIVELOONEY = 10000002
 GIVEINDEP = 10000  # used as: tag = -GIVEINDEP - index
+INF = 10 ** 9      # search bound, beyond any evaluate() value
+# worker processes for the root search; 1 searches in this process only. Above 1,
+# root children after the first are searched in parallel (Young Brothers Wait). The
+# workers come from fork_pool.py beside game_match.py, and only where processes can fork
+ROOT_WORKERS = 1
+ROOT_PARALLEL_DEPTH = 3  # shallower iterations are too quick to be worth farming out
+
+# ----- Transposition table -----
+# key -> (value - 200*score, depth, flag, best move). Values grow one-for-one
+# with score * 200, so they are stored relative to it and the key only covers the
+# shape of the position (score and whoToMove are left out). The table is kept from
+# one make_move to the next; each board size numbers its half-edges the same way
+# every turn, so positions searched on earlier turns are found again.
+TT_EXACT, TT_LOWER, TT_UPPER = 0, 1, 2
+TT_MAX_ENTRIES = 1 << 18  # about 65 MB; every tournament worker keeps its own table for a whole match
+TT: "OrderedDict[int, tuple]" = OrderedDict()
+
+_ZOBRIST: Dict[int, tuple] = {}
+_KEY_MASK = (1 << 64) - 1
+
+def _zobrist_keys(n: int) -> tuple:
+    """Random 64-bit keys for a position with n half-edges, built once per n:
+    (other, nxt, length) tables indexed [he][value + 2] for otherHe/nextHe/heLengths
+    (values run from REMOVED up to n), plus looney[value] and indep[isChain][length]."""
+    keys = _ZOBRIST.get(n)
+    if keys is None:
+        rng = random.Random(n)
+        def table() -> List[List[int]]:
+            return [[rng.getrandbits(64) for _ in range(n + 3)] for _ in range(n)]
+        keys = (table(), table(), table(),
+                [rng.getrandbits(64) for _ in range(5)],
+                [[rng.getrandbits(64) for _ in range(n + 3)] for _ in range(2)])
+        _ZOBRIST[n] = keys
+    return keys
+
+def _tt_store(key: int, value: int, depth: int, flag: int, best_move: Optional[int]) -> None:
+    TT[key] = (value, depth, flag, best_move)
+    TT.move_to_end(key)
+    if len(TT) > TT_MAX_ENTRIES:
+        TT.popitem(last=False)  # evict the least recently used entry
 
 # ----- Negamax (extra-turn sign rule) -----
 class _Stats:
@@ -20,46 +62,128 @@ class _Stats:
         self.leaves = 0
 stats = _Stats()
 
-def _negamax(st: "DotsAndBoxesState", depth: int, alpha: float, beta: float) -> float:
+def _negamax(st: "DotsAndBoxesState", depth: int, alpha: int, beta: int) -> int:
     stats.nodes += 1
-    if depth == 0 or st.gameIsOver():
+    if depth == 0:
         stats.leaves += 1
         return st.evaluate()
-
-    children = st.listMoves()
-    if not children:
+    boxesLeft, value = st.boxesLeftAndValue()
+    if boxesLeft == 0:  # game over
+        stats.leaves += 1
+        return value
+
+    key = st.ttKey()
+    base = st.score * 200
+    entry = TT.get(key)
+    if entry is not None and entry[1] >= depth:
+        TT.move_to_end(key)
+        value, flag = entry[0] + base, entry[2]
+        if flag == TT_EXACT:
+            return value
+        if flag == TT_LOWER:
+            if value > alpha:
+                alpha = value
+        elif value < beta:
+            beta = value
+        if alpha >= beta:
+            return value
+    alpha_orig, beta_orig = alpha, beta
+
+    moves = list(st.listMoves())
+    if not moves:
         return st.evaluate()
 
-    best = -math.inf
-    for child in children:
+    # try the best move of an earlier (shallower) search of this position first
+    if entry is not None and entry[3] is not None and entry[3] != moves[0] and entry[3] in moves:
+        moves.remove(entry[3])
+        moves.insert(0, entry[3])
+
+    best = -INF
+    best_move = None
+    whoToMove = st.whoToMove
+    undo, apply, rollback = st.undo, st.apply, st.rollback
+    for move in moves:
+        mark = len(undo)
+        apply(move)
         # negate only if the mover flips (captures keep turn)
-        multiplier = st.whoToMove * child.whoToMove
-        if multiplier == -1:
-            val = -_negamax(child, depth - 1, -beta, -alpha)
+        if st.whoToMove != whoToMove:
+            val = -_negamax(st, depth - 1, -beta, -alpha)
         else:
-            val =  _negamax(child, depth - 1,  alpha,  beta)
+            val =  _negamax(st, depth - 1,  alpha,  beta)
+        rollback(mark)
         if val > best:
             best = val
+            best_move = move
         if best >= beta:
             break
-        alpha = max(alpha, best)
+        if best > alpha:
+            alpha = best
+
+    if best <= alpha_orig:
+        flag = TT_UPPER
+    elif best >= beta_orig:
+        flag = TT_LOWER
+    else:
+        flag = TT_EXACT
+    _tt_store(key, best - base, depth, flag, best_move)
     return best
 
 def _reset_stats() -> None:
     stats.nodes = 0
     stats.leaves = 0
 
+# ----- Parallel root search -----
+def _start_root_pool(task: Callable[..., int]) -> Optional["ForkPool"]:
+    """ROOT_WORKERS forked processes running task for one search, or None where
+    processes can't fork, in which case the search runs in this process only."""
+    # Imported here so the file still stands alone while ROOT_WORKERS is 1
+    from fork_pool import ForkPool, available
+    return ForkPool(ROOT_WORKERS, task) if available() else None
+
+def _search_root_child(child: "DotsAndBoxesState", depth: int, alpha: int, beta: int) -> int:
+    """Value of a root child for the player at the root, searched within (alpha, beta)."""
+    if child.whoToMove == -1:
+        return -_negamax(child, depth, -beta, -alpha)
+    return _negamax(child, depth, alpha, beta)
+
+# ----- State pool -----
+# Spare DotsAndBoxesState shells, so clone() can copy into existing lists rather
+# than allocating new ones. The number of half-edges never changes during a
+# search, but shells are only reused for a state of the same size.
+_STATE_POOL: List["DotsAndBoxesState"] = []
+
+def acquire(n: int) -> Optional["DotsAndBoxesState"]:
+    """A pooled state with n half-edges, or None if there is none to reuse."""
+    if _STATE_POOL and _STATE_POOL[-1].N == n:
+        return _STATE_POOL.pop()
+    return None
+
+def release(st: "DotsAndBoxesState") -> None:
+    """Give a state that is no longer used back to the pool."""
+    if _STATE_POOL and _STATE_POOL[-1].N != st.N:
+        _STATE_POOL.clear()  # board size changed, the old shells are no use
+    _STATE_POOL.append(st)
+
 # ----- Half-edge state -----
+# undo log entries, see DotsAndBoxesState.rollback
+_UNDO_SET = 0      # (_UNDO_SET, list, index, old value)
+_UNDO_APPEND = 1   # (_UNDO_APPEND,): an indep was appended
+_UNDO_POP = 2      # (_UNDO_POP, index, length, isChain): indep `index` was popped
+_UNDO_SCALARS = 3  # (_UNDO_SCALARS, score, whoToMove, looneyValue, zobrist, live, joints, boxesLeft)
+
 class DotsAndBoxesState:
+    # otherHe/nextHe/heLengths are array('i') rather than lists: the ints are
+    # stored unboxed, which keeps them compact and makes copies a memcpy.
     def __init__(self,
-                 otherHe: List[int],
-                 nextHe: List[int],
-                 heLengths: List[int],
+                 otherHe: "array[int]",
+                 nextHe: "array[int]",
+                 heLengths: "array[int]",
                  indeps: List[int],
                  indepAreChains: List[bool],
                  looneyValue: int,
                  score: int,
-                 whoToMove: int) -> None:
+                 whoToMove: int,
+                 zobrist: Optional[int] = None) -> None:
         self.otherHe = otherHe
         self.nextHe = nextHe
         self.heLengths = heLengths
@@ -68,177 +192,259 @@ class DotsAndBoxesState:
         self.looneyValue = looneyValue
         self.score = score     # net to the player about to move
         self.whoToMove = whoToMove  # +1 or -1
+        self.N = len(otherHe)  # number of half-edges, fixed for the whole search
+        # Zobrist hash of otherHe/nextHe/heLengths, kept up to date by removeHe/simplifyLink
+        self.zkeys = _zobrist_keys(len(otherHe))
+        if zobrist is None:
+            zOther, zNext, zLen = self.zkeys[:3]
+            zobrist = 0
+            for he in range(len(otherHe)):
+                zobrist ^= zOther[he][otherHe[he] + 2] ^ zNext[he][nextHe[he] + 2] ^ zLen[he][heLengths[he] + 2]
+        self.zobrist = zobrist
+        # sum of the indep keys, so the indeps hash as a multiset; see ttKey
+        self.zindeps = sum(self.zkeys[4][isChain][L] for L, isChain in zip(indeps, indepAreChains))
+        # predecessor of each half-edge in its nextHe cycle, kept up to date by _setNext
+        prevHe = array('i', [REMOVED]) * len(nextHe)
+        for he in range(len(nextHe)):
+            if nextHe[he] >= 0:
+                prevHe[nextHe[he]] = he
+        self.prevHe = prevHe
+        # bitboard of the half-edges that are not REMOVED, kept up to date by _setOther
+        live = 0
+        for he in range(len(otherHe)):
+            if otherHe[he] != REMOVED:
+                live |= 1 << he
+        self.live = live
+        # number of joints (cycles in nextHe), kept up to date by removeHe/simplifyLink
+        joints = 0
+        seen = 0
+        for he in range(len(nextHe)):
+            if otherHe[he] != REMOVED and not (seen >> he) & 1:
+                joints += 1
+                nHe = he
+                seen |= 1 << he
+                while he != nextHe[nHe]:
+                    nHe = nextHe[nHe]
+                    seen |= 1 << nHe
+        self.joints = joints
+        # numBoxesLeft() once computed, None after any change to the position
+        self._boxesLeft: Optional[int] = None
+        # every change made to the state, so apply() can be undone by rollback()
+        self.undo: List[tuple] = []
+
+    def __getstate__(self) -> dict:
+        # the Zobrist tables are rebuilt on the other side rather than pickled
+        state = self.__dict__.copy()
+        del state["zkeys"]
+        state["undo"] = []
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.zkeys = _zobrist_keys(self.N)
 
     def clone(self) -> "DotsAndBoxesState":
-        return DotsAndBoxesState(
-            self.otherHe[:],
-            self.nextHe[:],
-            self.heLengths[:],
-            self.indeps[:],
-            self.indepAreChains[:],
-            self.looneyValue,
-            self.score,
-            self.whoToMove
-        )
+        dst = acquire(self.N)
+        if dst is None:
+            return DotsAndBoxesState(
+                self.otherHe[:],
+                self.nextHe[:],
+                self.heLengths[:],
+                self.indeps[:],
+                self.indepAreChains[:],
+                self.looneyValue,
+                self.score,
+                self.whoToMove,
+                self.zobrist
+            )
+        # reuse the pooled shell's buffers instead of allocating new lists
+        dst.otherHe[:] = self.otherHe
+        dst.nextHe[:] = self.nextHe
+        dst.prevHe[:] = self.prevHe
+        dst.heLengths[:] = self.heLengths
+        dst.indeps[:] = self.indeps
+        dst.indepAreChains[:] = self.indepAreChains
+        dst.looneyValue = self.looneyValue
+        dst.score = self.score
+        dst.whoToMove = self.whoToMove
+        dst.zkeys = self.zkeys
+        dst.zobrist = self.zobrist
+        dst.zindeps = self.zindeps
+        dst.live = self.live
+        dst.joints = self.joints
+        dst._boxesLeft = self._boxesLeft
+        dst.undo.clear()
+        return dst
+
+    def ttKey(self) -> int:
+        """Transposition table key: the half-edge hash plus the looney value and
+        the independent chains/loops (as a multiset, their order doesn't matter)."""
+        return ((self.zobrist ^ self.zkeys[3][self.looneyValue]) + self.zindeps) & _KEY_MASK
+
+    def _setOther(self, he: int, value: int) -> None:
+        otherHe = self.otherHe
+        old = otherHe[he]
+        z = self.zkeys[0][he]
+        self.zobrist ^= z[old + 2] ^ z[value + 2]
+        if value == REMOVED:
+            self.live &= ~(1 << he)
+        elif old == REMOVED:
+            self.live |= 1 << he
+        otherHe[he] = value
+        self.undo.append((_UNDO_SET, otherHe, he, old))
+
+    def _setNext(self, he: int, value: int) -> None:
+        nextHe, undo = self.nextHe, self.undo
+        old = nextHe[he]
+        z = self.zkeys[1][he]
+        self.zobrist ^= z[old + 2] ^ z[value + 2]
+        nextHe[he] = value
+        undo.append((_UNDO_SET, nextHe, he, old))
+        if value >= 0:
+            prevHe = self.prevHe
+            undo.append((_UNDO_SET, prevHe, value, prevHe[value]))
+            prevHe[value] = he
+
+    def _setLength(self, he: int, value: int) -> None:
+        heLengths = self.heLengths
+        old = heLengths[he]
+        z = self.zkeys[2][he]
+        self.zobrist ^= z[old + 2] ^ z[value + 2]
+        heLengths[he] = value
+        self.undo.append((_UNDO_SET, heLengths, he, old))
+
+    def _appendIndep(self, length: int, isChain: bool) -> None:
+        self.indeps.append(length)
+        self.indepAreChains.append(isChain)
+        self.zindeps += self.zkeys[4][isChain][length]
+        self.undo.append((_UNDO_APPEND,))
+
+    def _popIndep(self, index: int) -> None:
+        length, isChain = self.indeps.pop(index), self.indepAreChains.pop(index)
+        self.zindeps -= self.zkeys[4][isChain][length]
+        self.undo.append((_UNDO_POP, index, length, isChain))
+
+    def rollback(self, mark: int) -> None:
+        """Undoes every change logged after len(self.undo) was mark."""
+        undo = self.undo
+        if len(undo) <= mark:
+            return
+        # walk the tail newest first, then drop it in one go rather than pop() per entry
+        for entry in reversed(undo[mark:]):
+            kind = entry[0]
+            if kind == _UNDO_SET:
+                _, values, index, old = entry
+                values[index] = old
+            elif kind == _UNDO_APPEND:
+                self.zindeps -= self.zkeys[4][self.indepAreChains.pop()][self.indeps.pop()]
+            elif kind == _UNDO_POP:
+                self.indeps.insert(entry[1], entry[2])
+                self.indepAreChains.insert(entry[1], entry[3])
+                self.zindeps += self.zkeys[4][entry[3]][entry[2]]
+            else:
+                (_, self.score, self.whoToMove, self.looneyValue,
+                 self.zobrist, self.live, self.joints, self._boxesLeft) = entry
+        del undo[mark:]
 
     def numBoxesLeft(self) -> int:
-        counted = [None] * len(self.otherHe)
-        s = self.looneyValue
-
-        # joints (cycles in nextHe)
-        for he in range(len(self.otherHe)):
-            if self.otherHe[he] != REMOVED and counted[he] != REMOVED:
-                s += 1
-                nHe = he
-                counted[he] = REMOVED
-                while he != self.nextHe[nHe]:
-                    nHe = self.nextHe[nHe]
-                    counted[nHe] = REMOVED
-
-        counted = [None] * len(self.otherHe)
-        # chains (paired across boxes)
-        for he in range(len(self.otherHe)):
-            if self.otherHe[he] != REMOVED and counted[he] != REMOVED:
-                s += self.heLengths[he]
-                counted[he] = REMOVED
-                oHe = self.otherHe[he]
-                if oHe != DEADEND:
-                    counted[oHe] = REMOVED
+        if self._boxesLeft is not None:
+            return self._boxesLeft
+        s = self.looneyValue + self.joints
+        # chains (paired across boxes), counted once from their higher end
+        otherHe, heLengths = self.otherHe, self.heLengths
+        rest = self.live
+        while rest:
+            low = rest & -rest
+            rest ^= low
+            he = low.bit_length() - 1
+            if he > otherHe[he]:
+                s += heLengths[he]
 
         for v in self.indeps:
             s += v
+        self._boxesLeft = s
         return s
 
     def gameIsOver(self) -> bool:
         return self.numBoxesLeft() == 0
 
-    def evaluate(self) -> float:
-        num_left = self.numBoxesLeft() * 100
-        points = self.score * 100
+    def evaluate(self) -> int:
+        # in units of half a box per 100, so the value of a looney position
+        # (the score plus half the boxes left, rounded up) stays an int
+        return self.boxesLeftAndValue()[1]
+
+    def boxesLeftAndValue(self) -> Tuple[int, int]:
+        """numBoxesLeft() and evaluate() from a single count of the boxes."""
+        boxesLeft = self.numBoxesLeft()
+        points = self.score * 200
         if self.looneyValue != 0:
-            half_remaining = num_left % 200
-            return float(points + (num_left + half_remaining) / 2)
-        return float(points)
+            return boxesLeft, points + 100 * (boxesLeft + (boxesLeft & 1))
+        return boxesLeft, points
 
     def simplifyLink(self, he: int) -> None:
-        he1 = self.nextHe[he]
-        if he1 == DEADEND:
+        self._boxesLeft = None
+        nextHe = self.nextHe
+        he1 = nextHe[he]
+        if he1 < 0:  # DEADEND, or he was removed
             return
-        he2 = self.nextHe[he1]
+        he2 = nextHe[he1]
         if he1 != he and he2 == he:
-            otherHe1 = self.otherHe[he1]
-            otherHe2 = self.otherHe[he2]
+            otherHe, heLengths = self.otherHe, self.heLengths
+            setOther, setLength, setNext = self._setOther, self._setLength, self._setNext
+            otherHe1 = otherHe[he1]
+            otherHe2 = otherHe[he2]
 
             if otherHe1 == he2:
                 # loop
-                self.indeps.append(1 + self.heLengths[otherHe2])
-                self.indepAreChains.append(False)
+                self._appendIndep(1 + heLengths[otherHe2], False)
             else:
-                length = 1 + self.heLengths[he1] + self.heLengths[he2]
+                length = 1 + heLengths[he1] + heLengths[he2]
                 if otherHe1 != DEADEND:
-                    self.otherHe[otherHe1] = otherHe2
-                    self.heLengths[otherHe1] = length
+                    setOther(otherHe1, otherHe2)
+                    setLength(otherHe1, length)
                 if otherHe2 != DEADEND:
-                    self.otherHe[otherHe2] = otherHe1
-                    self.heLengths[otherHe2] = length
+                    setOther(otherHe2, otherHe1)
+                    setLength(otherHe2, length)
                 if otherHe1 == DEADEND and otherHe2 == DEADEND:
-                    self.indeps.append(length)
-                    self.indepAreChains.append(True)
+                    self._appendIndep(length, True)
 
-            self.heLengths[he1] = self.heLengths[he2] = REMOVED
-            self.otherHe[he1] = self.otherHe[he2] = REMOVED
-            self.nextHe[he1] = self.nextHe[he2] = REMOVED
+            self.joints -= 1  # the two-sided box is gone
+            for h in (he1, he2):
+                setLength(h, REMOVED)
+                setOther(h, REMOVED)
+                setNext(h, REMOVED)
 
     def removeHe(self, he: int) -> None:
+        self._boxesLeft = None
         oHe = self.otherHe[he]
-        self.otherHe[he] = REMOVED
-        nHe = he
-        while self.nextHe[nHe] != he:
-            nHe = self.nextHe[nHe]
-        self.nextHe[nHe] = self.nextHe[he]
-        self.nextHe[he] = REMOVED
-        self.heLengths[he] = REMOVED
+        self._setOther(he, REMOVED)
+        nHe = self.prevHe[he]
+        if nHe == he:
+            self.joints -= 1  # it was the box's last half-edge
+        self._setNext(nHe, self.nextHe[he])
+        self._setNext(he, REMOVED)
+        self._setLength(he, REMOVED)
         # (JS does not directly change otherHe[oHe] here.)
 
-    def listMoves(self, heList: Optional[List[int]] = None) -> List["DotsAndBoxesState"]:
-        ret: List[DotsAndBoxesState] = []
-
+    def listMoves(self):
+        """Yields the moves of this position: a half-edge index, EATLOONEY/GIVELOONEY,
+        or -GIVEINDEP - index to open an independent chain or loop. Moves are played
+        with apply(); the generator may be resumed after apply() + rollback()."""
         if self.looneyValue > 0:
-            # eat and keep turn
-            st = self.clone()
-            st.score += self.looneyValue
-            st.looneyValue = 0
-            ret.append(st)
-            if heList is not None: heList.append(EATLOONEY)
-            # give and pass turn
-            st = self.clone()
-            st.score *= -1
-            st.whoToMove *= -1
-            st.score += self.looneyValue
-            st.looneyValue = 0
-            ret.append(st)
-            if heList is not None: heList.append(GIVELOONEY)
-            return ret
-
-        for he in range(len(self.otherHe)):
-            if self.otherHe[he] == REMOVED:
-                continue
-            oHe = self.otherHe[he]
-            length = self.heLengths[he]
-            if he < oHe:
-                continue  # handle pair once
-
-            st = self.clone()
-            # detect loop by local cycle structure
-            isLoop = (
-                self.nextHe[he] == oHe
-                or self.nextHe[self.nextHe[he]] == oHe
-                or self.nextHe[self.nextHe[self.nextHe[he]]] == oHe
-            )
-
-            he3 = REMOVED
-            if isLoop:
-                if (
-                    self.nextHe[he] == he
-                    or self.nextHe[self.nextHe[he]] == he
-                    or self.nextHe[self.nextHe[self.nextHe[he]]] == he
-                ):
-                    he3 = he
-                    while he3 == he or he3 == oHe:
-                        he3 = self.nextHe[he3]
-                    length += self.heLengths[he3] + 1
-
-            nHe = self.nextHe[he]
-            noHe = self.nextHe[oHe] if oHe != DEADEND else REMOVED
-
-            st.removeHe(he)
-            if oHe != DEADEND:
-                st.removeHe(oHe)
-
-            st.simplifyLink(nHe)
-            if noHe != DEADEND:
-                st.simplifyLink(noHe)
-
-            if he3 != REMOVED:
-                oHe3 = self.otherHe[he3]
-                st.removeHe(he3)
-                if oHe3 != DEADEND:
-                    st.removeHe(oHe3)
-                    st.simplifyLink(oHe3)
-
-            leaveNumber = 2
-            st.whoToMove *= -1
-            st.score *= -1
-
-            if length > leaveNumber:
-                st.score += length - leaveNumber
-                st.looneyValue = leaveNumber
-            else:
-                st.score += length
-                st.looneyValue = 0
+            # eat and keep turn, or give and pass turn
+            yield EATLOONEY
+            yield GIVELOONEY
+            return
 
-            if heList is not None: heList.append(he)
-            ret.append(st)
+        otherHe = self.otherHe
+        live = self.live
+        while live:
+            low = live & -live
+            live ^= low
+            he = low.bit_length() - 1
+            if he < otherHe[he]:
+                continue  # handle pair once
+            yield he
 
         # break smallest independent loop and smallest independent chain
         minChain = math.inf; minLoop = math.inf
@@ -249,76 +455,184 @@ class DotsAndBoxesState:
             else:
                 if L < minLoop:  minLoop, iLoop  = L, i
 
-        def _break_indep(index: int) -> None:
-            st = self.clone()
-            if st.indepAreChains[index]:
+        if iLoop > -1:  yield -GIVEINDEP - iLoop
+        if iChain > -1: yield -GIVEINDEP - iChain
+
+    def apply(self, move: int) -> None:
+        """Plays a move from listMoves in place, logging every change to self.undo."""
+        self.undo.append((_UNDO_SCALARS, self.score, self.whoToMove, self.looneyValue,
+                          self.zobrist, self.live, self.joints, self._boxesLeft))
+        self._boxesLeft = None
+
+        if move == EATLOONEY:
+            self.score += self.looneyValue
+            self.looneyValue = 0
+            return
+        if move == GIVELOONEY:
+            self.score *= -1
+            self.whoToMove *= -1
+            self.score += self.looneyValue
+            self.looneyValue = 0
+            return
+
+        if move <= -GIVEINDEP:
+            index = -move - GIVEINDEP
+            if self.indepAreChains[index]:
                 leaveNumber, minNumber = 2, 3
             else:
                 leaveNumber, minNumber = 4, 4
-            st.whoToMove *= -1
-            st.score *= -1
-            L = st.indeps[index]
+            self.whoToMove *= -1
+            self.score *= -1
+            L = self.indeps[index]
             if L >= minNumber:
-                st.looneyValue = leaveNumber
-                st.score += L - leaveNumber
+                self.looneyValue = leaveNumber
+                self.score += L - leaveNumber
             else:
-                st.score += L
-                st.looneyValue = 0
-            st.indeps.pop(index)
-            st.indepAreChains.pop(index)
-            ret.append(st)
-            if heList is not None: heList.append(-GIVEINDEP - index)
+                self.score += L
+                self.looneyValue = 0
+            self._popIndep(index)
+            return
 
-        if iLoop > -1:  _break_indep(iLoop)
-        if iChain > -1: _break_indep(iChain)
-        return ret
+        he = move
+        otherHe, nextHe = self.otherHe, self.nextHe
+        oHe = otherHe[he]
+        length = self.heLengths[he]
+        # detect loop by local cycle structure
+        n1 = nextHe[he]
+        n2 = nextHe[n1]
+        n3 = nextHe[n2]
+        isLoop = n1 == oHe or n2 == oHe or n3 == oHe
+
+        he3 = REMOVED
+        if isLoop:
+            if n1 == he or n2 == he or n3 == he:
+                he3 = he
+                while he3 == he or he3 == oHe:
+                    he3 = nextHe[he3]
+                length += self.heLengths[he3] + 1
+        oHe3 = otherHe[he3] if he3 != REMOVED else REMOVED
+
+        nHe = n1
+        noHe = nextHe[oHe] if oHe != DEADEND else REMOVED
+
+        self.removeHe(he)
+        if oHe != DEADEND:
+            self.removeHe(oHe)
+
+        self.simplifyLink(nHe)
+        if noHe != DEADEND:
+            self.simplifyLink(noHe)
+
+        if he3 != REMOVED:
+            self.removeHe(he3)
+            if oHe3 != DEADEND:
+                self.removeHe(oHe3)
+                self.simplifyLink(oHe3)
+
+        leaveNumber = 2
+        self.whoToMove *= -1
+        self.score *= -1
+
+        if length > leaveNumber:
+            self.score += length - leaveNumber
+            self.looneyValue = leaveNumber
+        else:
+            self.score += length
+            self.looneyValue = 0
 
 # ----- Build half-edges from the current board -----
 def _assignHEIndices(vhLines: List[List[bool]],
                      vhToHEA: List[List[int]],
                      vhToHEB: List[List[int]],
-                     otherHe: List[int]) -> None:
-    for x in range(len(vhLines)):
-        vhToHEA[x] = []
-        vhToHEB[x] = []
-        for y in range(len(vhLines[x])):
-            if not vhLines[x][y]:
-                if x == 0:
-                    vhToHEB[x].append(len(otherHe))
-                    otherHe.append(DEADEND)
-                    vhToHEA[x].append(REMOVED)
-                elif x == len(vhLines) - 1:
-                    vhToHEA[x].append(len(otherHe))
-                    otherHe.append(DEADEND)
-                    vhToHEB[x].append(REMOVED)
-                else:
-                    a = len(otherHe); b = a + 1
-                    vhToHEA[x].append(a)
-                    vhToHEB[x].append(b)
-                    otherHe.append(b)
-                    otherHe.append(a)
+                     otherHe: "array[int]") -> None:
+    # Every line gets its half-edges, drawn or not, so a board size always numbers
+    # them the same way and positions from earlier turns can be found in the TT;
+    # a drawn line's half-edges start out REMOVED.
+    # rows 0 and last are on the border: their lines have a single half-edge
+    last = len(vhLines) - 1
+    n = len(otherHe)
+    for x, row in enumerate(vhLines):
+        heA: List[int] = []
+        heB: List[int] = []
+        for taken in row:
+            if x == 0:
+                heA.append(REMOVED)
+                heB.append(n)
+                otherHe.append(REMOVED if taken else DEADEND)
+                n += 1
+            elif x == last:
+                heA.append(n)
+                heB.append(REMOVED)
+                otherHe.append(REMOVED if taken else DEADEND)
+                n += 1
             else:
-                vhToHEA[x].append(REMOVED)
-                vhToHEB[x].append(REMOVED)
-
-def _heToCoords(he: int,
-                vLeft: List[List[int]], vRight: List[List[int]],
-                hUp: List[List[int]],   hDown: List[List[int]]) -> Tuple[int,int,int,int,str]:
+                heA.append(n)
+                heB.append(n + 1)
+                if taken:
+                    otherHe.extend((REMOVED, REMOVED))
+                else:
+                    otherHe.extend((n + 1, n))
+                n += 2
+        vhToHEA[x] = heA
+        vhToHEB[x] = heB
+
+def _heCoordsTable(n: int,
+                   vLeft: List[List[int]], vRight: List[List[int]],
+                   hUp: List[List[int]],   hDown: List[List[int]]) -> List[Tuple[int,int,int,int,str]]:
+    """Reverse of the vLeft/vRight/hUp/hDown maps: entry he is the (x1, y1, x2, y2, side)
+    segment of half-edge he, for all n half-edges."""
+    table: List[Optional[Tuple[int,int,int,int,str]]] = [None] * n
     # verticals
     for x in range(len(vLeft)):
         for y in range(len(vLeft[x])):
-            if vLeft[x][y] == he:
-                return (x, y, x, y + 1, "left")
-            if vRight[x][y] == he:
-                return (x, y, x, y + 1, "right")
+            if vLeft[x][y] >= 0:
+                table[vLeft[x][y]] = (x, y, x, y + 1, "left")
+            if vRight[x][y] >= 0:
+                table[vRight[x][y]] = (x, y, x, y + 1, "right")
     # horizontals
     for y in range(len(hUp)):
         for x in range(len(hUp[y])):
-            if hUp[y][x] == he:
-                return (x, y, x + 1, y, "up")
-            if hDown[y][x] == he:
-                return (x, y, x + 1, y, "down")
-    raise RuntimeError("he not found")
+            if hUp[y][x] >= 0:
+                table[hUp[y][x]] = (x, y, x + 1, y, "up")
+            if hDown[y][x] >= 0:
+                table[hDown[y][x]] = (x, y, x + 1, y, "down")
+    return table
+
+def _boardSymmetries(hLines: List[List[bool]], vLines: List[List[bool]]) -> List[Tuple[bool,bool,bool]]:
+    """The reflections/rotations other than the identity that map the drawn lines onto
+    themselves, each as (transpose, flip x, flip y) applied to dots in that order."""
+    W, H = len(vLines) - 1, len(hLines) - 1
+    drawn = set()
+    for x in range(W + 1):
+        for y in range(H):
+            if vLines[x][y]:
+                drawn.add((x, y, x, y + 1))
+    for y in range(H + 1):
+        for x in range(W):
+            if hLines[y][x]:
+                drawn.add((x, y, x + 1, y))
+    syms = []
+    for transpose in ((False, True) if W == H else (False,)):
+        for flipX in (False, True):
+            for flipY in (False, True):
+                sym = (transpose, flipX, flipY)
+                if sym != (False, False, False) and \
+                        all(_mapSegment(seg, sym, W, H) in drawn for seg in drawn):
+                    syms.append(sym)
+    return syms
+
+def _mapSegment(seg: Tuple[int,int,int,int], sym: Tuple[bool,bool,bool],
+                W: int, H: int) -> Tuple[int,int,int,int]:
+    """The image of the segment (x1, y1, x2, y2) under a board symmetry, ends in order."""
+    x1, y1, x2, y2 = seg
+    transpose, flipX, flipY = sym
+    if transpose:
+        x1, y1, x2, y2 = y1, x1, y2, x2
+    if flipX:
+        x1, x2 = W - x1, W - x2
+    if flipY:
+        y1, y2 = H - y1, H - y2
+    return (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
 
 def _coords_to_move(x1: int, y1: int, x2: int, y2: int) -> Tuple[int,int,str]:
     # horizontal if y1==y2 and x2==x1+1
@@ -330,9 +644,7 @@ def _coords_to_move(x1: int, y1: int, x2: int, y2: int) -> Tuple[int,int,str]:
     raise RuntimeError("invalid segment")
 
 def _consider(hLines: List[List[bool]], vLines: List[List[bool]], currentScore: int) -> Tuple[int,int,str]:
-    otherHe: List[int] = []
-    nextHe:  List[int] = []
-    heLen:   List[int] = []
+    otherHe: "array[int]" = array('i')
 
     vLeft:  List[List[int]] = [[] for _ in range(len(vLines))]
     vRight: List[List[int]] = [[] for _ in range(len(vLines))]
@@ -341,10 +653,14 @@ def _consider(hLines: List[List[bool]], vLines: List[List[bool]], currentScore:
 
     _assignHEIndices(vLines, vLeft, vRight, otherHe)
     _assignHEIndices(hLines, hUp,   hDown,  otherHe)
+    heCoords = _heCoordsTable(len(otherHe), vLeft, vRight, hUp, hDown)
 
     # init arrays
-    nextHe = [DEADEND] * len(otherHe)
-    heLen  = [0]       * len(otherHe)
+    nextHe = array('i', [DEADEND]) * len(otherHe)
+    heLen  = array('i', [0])       * len(otherHe)
+    for he in range(len(otherHe)):
+        if otherHe[he] == REMOVED:  # drawn line
+            nextHe[he] = heLen[he] = REMOVED
 
     # build cycles for each box
     for x in range(len(vLines) - 1):
@@ -386,7 +702,7 @@ def _consider(hLines: List[List[bool]], vLines: List[List[bool]], currentScore:
             if gameState.nextHe[oHe] == gameState.otherHe[he]:
                 # broken loop
                 if heLen[he] != 2:
-                    x1,y1,x2,y2,_ = _heToCoords(he, vLeft, vRight, hUp, hDown)
+                    x1,y1,x2,y2,_ = heCoords[he]
                     return _coords_to_move(x1,y1,x2,y2)
                 else:
                     loops.append(he)
@@ -394,7 +710,7 @@ def _consider(hLines: List[List[bool]], vLines: List[List[bool]], currentScore:
             else:
                 # broken chain
                 if gameState.heLengths[he] != 1:
-                    x1,y1,x2,y2,_ = _heToCoords(he, vLeft, vRight, hUp, hDown)
+                    x1,y1,x2,y2,_ = heCoords[he]
                     return _coords_to_move(x1,y1,x2,y2)
                 else:
                     chains.append(he)
@@ -402,17 +718,17 @@ def _consider(hLines: List[List[bool]], vLines: List[List[bool]], currentScore:
 
     if len(chains) > 0 and len(loops) > 0:
         he = loops[0]
-        x1,y1,x2,y2,_ = _heToCoords(he, vLeft, vRight, hUp, hDown)
+        x1,y1,x2,y2,_ = heCoords[he]
         return _coords_to_move(x1,y1,x2,y2)
 
     if len(chains) > 1:
         he = chains[0]
-        x1,y1,x2,y2,_ = _heToCoords(he, vLeft, vRight, hUp, hDown)
+        x1,y1,x2,y2,_ = heCoords[he]
         return _coords_to_move(x1,y1,x2,y2)
 
     if len(loops) > 2:
         he = loops[0]
-        x1,y1,x2,y2,_ = _heToCoords(he, vLeft, vRight, hUp, hDown)
+        x1,y1,x2,y2,_ = heCoords[he]
         return _coords_to_move(x1,y1,x2,y2)
 
     # looney detection
@@ -435,55 +751,120 @@ def _consider(hLines: List[List[bool]], vLines: List[List[bool]], currentScore:
         looneyValue=gameState.looneyValue, score=currentScore, whoToMove=1
     )
 
-    heList: List[int] = []
-    children = gameState.listMoves(heList)
-    scores = [{"child": ch, "he": heList[i], "val": -math.inf} for i, ch in enumerate(children)]
+    moves = list(gameState.listMoves())
+    syms = _boardSymmetries(hLines, vLines)
+    if syms and gameState.looneyValue == 0:
+        # On a symmetric board, a move that is the mirror image of an earlier one has
+        # the same value, so only the first move of each such group is searched.
+        W, H = len(vLines) - 1, len(hLines) - 1
+        segHes: Dict[Tuple[int,int,int,int], List[int]] = {}
+        for he, coords in enumerate(heCoords):
+            segHes.setdefault(coords[:4], []).append(he)
+        kept: List[int] = []
+        for move in moves:
+            if move >= 0 and any(
+                    max(h, gameState.otherHe[h]) in kept
+                    for sym in syms
+                    for h in segHes.get(_mapSegment(heCoords[move][:4], sym, W, H), ())
+                    if gameState.otherHe[h] != REMOVED):
+                continue
+            kept.append(move)
+        moves = kept
+
+    scores = []
+    for move in moves:
+        child = gameState.clone()
+        child.apply(move)
+        scores.append({"child": child, "he": move, "val": -INF})
 
     MAX_DEPTH = 9  # tune as needed
     bestEdgeHe = None
-    for depth in range(1, MAX_DEPTH + 1):
-        _reset_stats()
-        bestVal = -math.inf
-        for s in scores:
-            child = s["child"]
-            mult = child.whoToMove
-            if mult == -1:
-                val = -_negamax(child, depth - 1, -math.inf, -bestVal)
-            else:
-                val =  _negamax(child, depth - 1,  bestVal,  math.inf)
-            s["val"] = max(s["val"], val)
-            if s["val"] > bestVal:
-                bestVal = s["val"]
-        scores.sort(key=lambda x: x["val"], reverse=True)
-        bestEdgeHe = scores[0]["he"]
+    pool = None
+    if ROOT_WORKERS > 1 and len(scores) > 1:
+        # The workers fork with their own copies of the children, found by half-edge
+        # because scores is re-sorted after every depth
+        children = {s["he"]: s["child"] for s in scores}
+        pool = _start_root_pool(lambda he, depth, alpha, beta: _search_root_child(
+            children[he], depth, alpha, beta))
+    ASPIRATION_WINDOW = 100  # half a box
+
+    def search_root(depth: int, alpha: int, beta: int) -> Optional[List[int]]:
+        """This depth's values of the root children searched within (alpha, beta), in
+        scores order, or None if the best of them falls outside the window."""
+        bestVal = alpha
+        if pool is not None and depth >= ROOT_PARALLEL_DEPTH:
+            # Young Brothers Wait: the first child sets bestVal here, then the rest are
+            # searched above it in the workers (each with its own TT)
+            first = _search_root_child(scores[0]["child"], depth - 1, bestVal, beta)
+            if first >= beta:
+                return None
+            bestVal = max(bestVal, scores[0]["val"], first)
+            futures = [pool.submit_task(s["he"], depth - 1, bestVal, beta) for s in scores[1:]]
+            try:
+                vals = [first] + [future.result() for future in futures]
+            finally:
+                for future in futures:
+                    future.cancel()
+        else:
+            vals = []
+            for s in scores:
+                val = _search_root_child(s["child"], depth - 1, bestVal, beta)
+                vals.append(val)
+                if val >= beta:
+                    break
+                bestVal = max(bestVal, s["val"], val)
+        if max(vals) >= beta or max(vals) <= alpha:
+            return None
+        return vals
+
+    try:
+        for depth in range(1, MAX_DEPTH + 1):
+            _reset_stats()
+            # aspiration window around the previous depth's best value; on a fail
+            # high or low the depth is searched again with the full window
+            vals = None
+            if bestEdgeHe is not None:
+                prev = scores[0]["val"]
+                vals = search_root(depth, prev - ASPIRATION_WINDOW, prev + ASPIRATION_WINDOW)
+            if vals is None:
+                vals = search_root(depth, -INF, INF)
+            for s, val in zip(scores, vals):
+                s["val"] = max(s["val"], val)
+            scores.sort(key=lambda x: x["val"], reverse=True)
+            bestEdgeHe = scores[0]["he"]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    for s in scores:
+        release(s["child"])
 
     # translate chosen half-edge to a board edge
     if gameState.looneyValue > 0 and looneyHe is not None:
         if bestEdgeHe == EATLOONEY:
-            x1,y1,x2,y2,_ = _heToCoords(looneyHe, vLeft, vRight, hUp, hDown)
+            x1,y1,x2,y2,_ = heCoords[looneyHe]
             return _coords_to_move(x1,y1,x2,y2)
         if bestEdgeHe == GIVELOONEY:
             he2 = unsimpl.otherHe[looneyHe]
             nxt = unsimpl.nextHe[he2]
-            x1,y1,x2,y2,_ = _heToCoords(nxt, vLeft, vRight, hUp, hDown)
+            x1,y1,x2,y2,_ = heCoords[nxt]
             return _coords_to_move(x1,y1,x2,y2)
     elif bestEdgeHe <= -GIVEINDEP:
         idx = -bestEdgeHe - GIVEINDEP
         indepHe = indepsToHe[idx]
         if gameState.indeps[idx] == 2 and unsimpl.otherHe[indepHe] == DEADEND:
             nxt = unsimpl.nextHe[indepHe]
-            x1,y1,x2,y2,_ = _heToCoords(nxt, vLeft, vRight, hUp, hDown)
+            x1,y1,x2,y2,_ = heCoords[nxt]
             return _coords_to_move(x1,y1,x2,y2)
         else:
-            x1,y1,x2,y2,_ = _heToCoords(indepHe, vLeft, vRight, hUp, hDown)
+            x1,y1,x2,y2,_ = heCoords[indepHe]
             return _coords_to_move(x1,y1,x2,y2)
     elif gameState.heLengths[bestEdgeHe] == 2:
         o = unsimpl.otherHe[bestEdgeHe]
         nxt = unsimpl.nextHe[o]
-        x1,y1,x2,y2,_ = _heToCoords(nxt, vLeft, vRight, hUp, hDown)
+        x1,y1,x2,y2,_ = heCoords[nxt]
         return _coords_to_move(x1,y1,x2,y2)
     else:
-        x1,y1,x2,y2,_ = _heToCoords(bestEdgeHe, vLeft, vRight, hUp, hDown)
+        x1,y1,x2,y2,_ = heCoords[bestEdgeHe]
         return _coords_to_move(x1,y1,x2,y2)
 
 # ----- Public entrypoint for the repo -----
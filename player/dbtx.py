@@ -1,15 +1,62 @@
-import copy
+# At or below this many free lines the rest of the game is solved exactly (see solve_exact)
+ENDGAME_MOVES = 16
+
+_box_masks = {}
+
+def box_side_masks(width, height):
+    """Packed four-side mask of every box, indexed r * width + c, built once per board size.
+    
+    Lines are packed into one int like DotsAndBoxesGame's edges: horizontal line (r, c)
+    is bit r*width + c and vertical line (r, c) is bit total_h + r*(width+1) + c.
+    """
+    key = (width, height)
+    if key not in _box_masks:
+        total_h = width * (height + 1)
+        _box_masks[key] = [(1 << (r * width + c)) | (1 << ((r + 1) * width + c)) |
+                           (1 << (total_h + r * (width + 1) + c)) |
+                           (1 << (total_h + r * (width + 1) + c + 1))
+                           for r in range(height) for c in range(width)]
+    return _box_masks[key]
+
+_chain_tables = {}
+
+def chain_tables(width, height):
+    """(coords, neighbors, move_box_ids) for a board size, built once so the chain
+    walk and move scoring never bounds-check.
+    
+    coords[b] is the (r, c) of box id b = r * width + c, neighbors[b] lists the ids of
+    the boxes above, below, left and right of it that are on the board, in that order,
+    and move_box_ids[move] the ids of the boxes on either side of the move's line.
+    """
+    key = (width, height)
+    if key not in _chain_tables:
+        coords = [(r, c) for r in range(height) for c in range(width)]
+        neighbors = [[nr * width + nc for nr, nc in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1))
+                      if 0 <= nr < height and 0 <= nc < width]
+                     for r, c in coords]
+        move_box_ids = {}
+        for r in range(height + 1):
+            for c in range(width):
+                move_box_ids[(r, c, 'H')] = [r2 * width + c for r2 in (r, r - 1) if 0 <= r2 < height]
+        for r in range(height):
+            for c in range(width + 1):
+                move_box_ids[(r, c, 'V')] = [r * width + c2 for c2 in (c, c - 1) if 0 <= c2 < width]
+        _chain_tables[key] = (coords, neighbors, move_box_ids)
+    return _chain_tables[key]
+
+def packed_lines(game_state):
+    """All drawn lines as one int, laid out as in box_side_masks."""
+    width, height = game_state["board_size"]
+    return game_state["h_bits"] | (game_state["v_bits"] << (width * (height + 1)))
 
 def is_legal_move(game_state, r, c, orientation):
     """Checks if a move is valid and the line is not already taken."""
     width, height = game_state["board_size"]
-    horizontal_lines = game_state["horizontal_lines"]
-    vertical_lines = game_state["vertical_lines"]
     
     if orientation == 'H':
-        return 0 <= r <= height and 0 <= c < width and (r, c) not in horizontal_lines
+        return 0 <= r <= height and 0 <= c < width and not (game_state["h_bits"] >> (r * width + c)) & 1
     elif orientation == 'V':
-        return 0 <= r < height and 0 <= c <= width and (r, c) not in vertical_lines
+        return 0 <= r < height and 0 <= c <= width and not (game_state["v_bits"] >> (r * (width + 1) + c)) & 1
     return False
 
 def make_move(game_state):
@@ -28,85 +75,199 @@ def make_move(game_state):
     if not available_moves:
         return None
     
+    # Few enough lines left to play the rest of the game perfectly
+    if len(available_moves) <= ENDGAME_MOVES:
+        return select_solved_move(game_state, available_moves)
+    
     # Analyze current game phase
     total_edges = width * (height + 1) + height * (width + 1)
-    edges_played = len(game_state["horizontal_lines"]) + len(game_state["vertical_lines"])
+    edges_played = game_state["h_bits"].bit_count() + game_state["v_bits"].bit_count()
     total_boxes = width * height
     boxes_claimed = len(game_state["box_owners"])
     
+    # Missing-edge count of every box, worked out once for the whole turn
+    degree = box_degrees(game_state)
+    
     # Check if we're in loony endgame (all remaining boxes are in chains/cycles)
-    is_loony_endgame = check_loony_endgame(game_state)
+    is_loony_endgame = check_loony_endgame(degree, board_size)
     
     if is_loony_endgame:
         # Endgame strategy: make double-dealing moves or open chains strategically
-        return select_endgame_move(game_state, available_moves, my_player_id)
+        return select_endgame_move(game_state, available_moves, my_player_id, degree)
     else:
         # Pre-endgame: avoid creating long chains, complete safe boxes
-        return select_safe_move(game_state, available_moves, my_player_id)
+        return select_safe_move(game_state, available_moves, my_player_id, degree)
 
 
-def check_loony_endgame(game_state):
+def check_loony_endgame(degree, board_size):
     """Check if all unclaimed boxes are part of long chains (3+) or cycles."""
-    width, height = game_state["board_size"]
+    # Claimed boxes have degree 0. If there's a box with degree 1 (capturable)
+    # or degree 3/4, not loony endgame
+    if 1 in degree or 3 in degree or 4 in degree:
+        return False
     
-    # Count unclaimed boxes not in chains/cycles
-    for r in range(height):
-        for c in range(width):
-            if (r, c) not in game_state["box_owners"]:
-                degree = count_box_degree(game_state, r, c)
-                # If there's a box with degree 1 (capturable) or degree 3/4, not loony endgame
-                if degree == 1 or degree >= 3:
-                    return False
+    # With every box claimed there are no chains to trace
+    if 2 not in degree:
+        return False
     
     # All remaining boxes are degree 2 (part of chains)
     # Check if any chains are short (1-2 boxes)
-    chains = find_all_chains(game_state)
-    for chain in chains:
+    chains = find_all_chains(degree, board_size)
+    for chain, _ in chains:
         if len(chain) <= 2:
             return False
     
     return len(chains) > 0
 
 
-def select_safe_move(game_state, available_moves, my_player_id):
+def select_solved_move(game_state, available_moves):
+    """Pick the move with the best exact outcome, found by alpha-beta search."""
+    width, height = game_state["board_size"]
+    total_h = width * (height + 1)
+    box_masks = box_side_masks(width, height)
+    move_box_ids = chain_tables(width, height)[2]
+    lines = packed_lines(game_state)
+    
+    # (bit, side masks of the boxes on either side) of every free line
+    edges = []
+    for r, c, orientation in available_moves:
+        if orientation == 'H':
+            bit = 1 << (r * width + c)
+        else:
+            bit = 1 << (total_h + r * (width + 1) + c)
+        edges.append((bit, [box_masks[i] for i in move_box_ids[(r, c, orientation)]]))
+    
+    children = []
+    for move, (bit, masks) in zip(available_moves, edges):
+        after = lines | bit
+        children.append((sum(after & mask == mask for mask in masks), after, move))
+    # Captures first, so the search window closes early
+    children.sort(key=lambda child: -child[0])
+    
+    table = {}
+    best_move = children[0][2]
+    best = -float("inf")
+    for completed, after, move in children:
+        if completed:
+            value = completed + solve_exact(after, edges, best - completed, float("inf"), table)
+        else:
+            value = -solve_exact(after, edges, -float("inf"), -best, table)
+        if value > best:
+            best = value
+            best_move = move
+    
+    return best_move
+
+
+def solve_exact(lines, edges, alpha, beta, table):
+    """Net boxes the player to move wins from here with perfect play, within (alpha, beta).
+    
+    Negamax with alpha-beta over the lines in edges. The result doesn't depend on the
+    score or on who is to move, so table caches (lower, upper) bounds by packed lines.
+    """
+    entry = table.get(lines)
+    if entry is not None:
+        lower, upper = entry
+        if lower >= beta:
+            return lower
+        if upper <= alpha:
+            return upper
+        if lower == upper:
+            return lower
+        alpha = max(alpha, lower)
+        beta = min(beta, upper)
+    else:
+        lower, upper = -float("inf"), float("inf")
+    
+    # Captures first (most boxes first), then moves leaving the fewest 3-sided boxes
+    children = []
+    for bit, masks in edges:
+        if lines & bit:
+            continue
+        after = lines | bit
+        completed = 0
+        threes = 0
+        for mask in masks:
+            sides = (after & mask).bit_count()
+            if sides == 4:
+                completed += 1
+            elif sides == 3:
+                threes += 1
+        children.append((-completed, threes, after, completed))
+    if not children:
+        return 0
+    children.sort()
+    
+    best = -float("inf")
+    a = alpha
+    for _, _, after, completed in children:
+        # Completing a box keeps the turn
+        if completed:
+            value = completed + solve_exact(after, edges, a - completed, beta - completed, table)
+        else:
+            value = -solve_exact(after, edges, -beta, -a, table)
+        if value > best:
+            best = value
+            if value > a:
+                a = value
+                if a >= beta:
+                    break
+    
+    if best <= alpha:
+        table[lines] = (lower, best)
+    elif best >= beta:
+        table[lines] = (best, upper)
+    else:
+        table[lines] = (best, best)
+    return best
+
+
+def select_safe_move(game_state, available_moves, my_player_id, degree):
     """
     Pre-endgame strategy:
     1. Complete boxes if safe (doesn't give opponent long chain)
     2. Otherwise, make moves that don't create long chains
     3. Fill in "safe" edges that don't complete boxes or create vulnerabilities
     """
+    board_size = game_state["board_size"]
+    _, neighbors, move_box_ids = chain_tables(*board_size)
+    # Chains of the current position by group, so each move only retraces the groups it touches
+    summary = chain_summary(degree, neighbors)
     move_evaluations = []
     
     for move in available_moves:
         score = 0
-        boxes_completed = count_boxes_completed(game_state, move)
         
-        # Simulate the move
-        sim_state = simulate_move(game_state, move, my_player_id)
+        # Simulate the move by taking its line off the boxes on either side, and
+        # put it back once the move is scored
+        touched = move_box_ids[move]
+        boxes_completed = sum(1 for i in touched if degree[i] == 1)
+        for i in touched:
+            degree[i] -= 1
         
         if boxes_completed > 0:
             # Completing boxes is great!
             score += boxes_completed * 10000
             
             # But check what we leave for opponent
-            opponent_capturable = count_capturable_boxes(sim_state)
-            opponent_long_chains = count_long_chains(sim_state)
+            _, opponent_long_chains = chains_after_move(degree, neighbors, summary, touched)
             
             # If we complete boxes but create a long chain for opponent, penalize
             if opponent_long_chains > 0:
                 score -= opponent_long_chains * 5000
             
             # Check if we get to continue safely
-            our_capturable = count_capturable_boxes(sim_state)
+            our_capturable = count_capturable_boxes(degree)
             if our_capturable > 0:
                 score += our_capturable * 1000
                 
         else:
             # Not completing boxes - evaluate safety
             
-            # Check what this creates for opponent
-            opponent_capturable = count_capturable_boxes(sim_state)
-            long_chains_created = count_long_chains(sim_state)
+            # Check what this creates for opponent; one chain count serves
+            # both the long-chain penalty and the average length below
+            opponent_capturable = count_capturable_boxes(degree)
+            num_chains, long_chains_created = chains_after_move(degree, neighbors, summary, touched)
             
             # Strongly avoid creating long chains (paper's key insight)
             if long_chains_created > 0:
@@ -120,13 +281,15 @@ def select_safe_move(game_state, available_moves, my_player_id):
             score += 100
             
             # Slightly prefer moves that advance toward endgame symmetrically
-            sim_chains = find_all_chains(sim_state)
-            if len(sim_chains) > 0:
-                # Creating short chains is ok, long chains are bad
-                avg_chain_length = sum(len(c) for c in sim_chains) / len(sim_chains)
+            if num_chains > 0:
+                # Creating short chains is ok, long chains are bad. Every degree-2
+                # box is in exactly one chain, so they add up to the total length
+                avg_chain_length = degree.count(2) / num_chains
                 if avg_chain_length <= 2:
                     score += 50
         
+        for i in touched:
+            degree[i] += 1
         move_evaluations.append((score, move))
     
     # Sort by score (highest first)
@@ -135,25 +298,34 @@ def select_safe_move(game_state, available_moves, my_player_id):
     return move_evaluations[0][1]
 
 
-def select_endgame_move(game_state, available_moves, my_player_id):
+def select_endgame_move(game_state, available_moves, my_player_id, degree):
     """
     Loony endgame strategy from the paper:
     - If in control: make double-dealing moves (leave 2 boxes in chains, 4 in cycles)
     - If not in control: open chains/cycles to maximize disjoint cycles
     """
+    board_size = game_state["board_size"]
+    # Every move is judged against the chains of the current position, so find them once
+    chains = find_all_chains(degree, board_size)
+    move_box_ids = chain_tables(*board_size)[2]
+    # Index into chains of the chain each box is in, -1 for none
+    width = board_size[0]
+    box_chain = [-1] * len(degree)
+    for index, (chain, _) in enumerate(chains):
+        for r, c in chain:
+            box_chain[r * width + c] = index
     move_evaluations = []
     
     for move in available_moves:
         score = 0
-        boxes_completed = count_boxes_completed(game_state, move)
-        sim_state = simulate_move(game_state, move, my_player_id)
+        boxes_completed = sum(1 for i in move_box_ids[move] if degree[i] == 1)
         
         if boxes_completed > 0:
             # We're claiming boxes - check for double-dealing opportunity
             score += boxes_completed * 1000
             
             # Check if this is in a chain or cycle we're claiming
-            chain_info = analyze_chain_for_move(game_state, move)
+            chain_info = analyze_chain_for_move(chains, box_chain, board_size, move)
             
             if chain_info:
                 chain_length, is_cycle_flag = chain_info
@@ -167,7 +339,7 @@ def select_endgame_move(game_state, available_moves, my_player_id):
                     score += 4000  # Double-dealing in chain
         else:
             # Opening a chain/cycle
-            chain_info = analyze_chain_for_move(game_state, move)
+            chain_info = analyze_chain_for_move(chains, box_chain, board_size, move)
             
             if chain_info:
                 chain_length, is_cycle_flag = chain_info
@@ -189,118 +361,157 @@ def select_endgame_move(game_state, available_moves, my_player_id):
     return move_evaluations[0][1]
 
 
-def analyze_chain_for_move(game_state, move):
+def analyze_chain_for_move(chains, box_chain, board_size, move):
     """Analyze if a move is part of a chain and return chain info."""
-    r, c, orientation = move
-    width, height = game_state["board_size"]
-    
-    # Find affected boxes
-    affected_boxes = []
-    
-    if orientation == 'H':
-        if r < height:
-            affected_boxes.append((r, c))
-        if r > 0:
-            affected_boxes.append((r - 1, c))
-    else:  # 'V'
-        if c < width:
-            affected_boxes.append((r, c))
-        if c > 0:
-            affected_boxes.append((r, c - 1))
-    
-    # Check if any affected box is part of a chain
-    chains = find_all_chains(game_state)
-    
-    for chain in chains:
-        for box in affected_boxes:
-            if box in chain:
-                is_cycle_flag = is_cycle(game_state, chain)
-                return (len(chain), is_cycle_flag)
+    # Chains of the affected boxes; the first chain found wins
+    found = [box_chain[i] for i in move_boxes(board_size, move) if box_chain[i] >= 0]
+    if not found:
+        return None
     
-    return None
+    chain, is_cycle_flag = chains[min(found)]
+    return (len(chain), is_cycle_flag)
 
 
-def count_capturable_boxes(game_state):
+def count_capturable_boxes(degree):
     """Count boxes with only 1 missing edge (immediately capturable)."""
-    width, height = game_state["board_size"]
-    count = 0
-    
-    for r in range(height):
-        for c in range(width):
-            if (r, c) not in game_state["box_owners"]:
-                if count_box_degree(game_state, r, c) == 1:
-                    count += 1
+    return degree.count(1)
+
+
+def count_chains(degree, neighbors, starts, visited):
+    """Trace chains like find_all_chains from each box id in starts, in order, and
+    return (chains, long chains of 3+) without building the chains themselves."""
+    chains = 0
+    long_chains = 0
+    
+    for start in starts:
+        if degree[start] != 2 or visited[start]:
+            continue
+        length = 0
+        current = start
+        while current is not None:
+            visited[current] = 1
+            length += 1
+            next_box = None
+            for n in neighbors[current]:
+                if degree[n] == 2 and not visited[n]:
+                    next_box = n
+                    break
+            current = next_box
+        chains += 1
+        if length >= 3:
+            long_chains += 1
+    
+    return chains, long_chains
+
+
+def chain_summary(degree, neighbors):
+    """Chain counts of a position, split by group of connected degree-2 boxes.
     
-    return count
+    A trace never leaves its group, so the chains found in one group don't depend on
+    the others. Returns (group, members, stats, totals): group[b] is the group id of
+    box b (-1 unless degree 2), members[g] the box ids of group g in increasing order,
+    stats[g] its (chains, long chains) and totals those of the whole board.
+    """
+    group = [-1] * len(degree)
+    members = []
+    for start, d in enumerate(degree):
+        if d == 2 and group[start] < 0:
+            g = len(members)
+            group[start] = g
+            boxes = [start]
+            for b in boxes:
+                for n in neighbors[b]:
+                    if degree[n] == 2 and group[n] < 0:
+                        group[n] = g
+                        boxes.append(n)
+            boxes.sort()
+            members.append(boxes)
+    
+    visited = bytearray(len(degree))
+    stats = [count_chains(degree, neighbors, boxes, visited) for boxes in members]
+    totals = (sum(s[0] for s in stats), sum(s[1] for s in stats))
+    return group, members, stats, totals
 
 
-def count_long_chains(game_state):
-    """Count chains of length 3+ (exploitable by opponent)."""
-    chains = find_all_chains(game_state)
-    return sum(1 for chain in chains if len(chain) >= 3)
+def chains_after_move(degree, neighbors, summary, touched):
+    """(chains, long chains) once the boxes in touched have their new degree,
+    retracing only the groups of the chain_summary that the change reaches."""
+    group, members, stats, (chains, long_chains) = summary
+    
+    # Groups the touched boxes leave, and groups a touched box now joins together
+    affected = set()
+    region = set()
+    for b in touched:
+        if group[b] >= 0:
+            affected.add(group[b])
+        if degree[b] == 2:
+            region.add(b)
+            for n in neighbors[b]:
+                if group[n] >= 0:
+                    affected.add(group[n])
+    
+    for g in affected:
+        chains -= stats[g][0]
+        long_chains -= stats[g][1]
+        region.update(members[g])
+    
+    new_chains, new_long = count_chains(degree, neighbors, sorted(region), bytearray(len(degree)))
+    return chains + new_chains, long_chains + new_long
 
 
-def find_all_chains(game_state):
-    """Find all chains and cycles of degree-2 boxes."""
-    width, height = game_state["board_size"]
-    visited = set()
+def find_all_chains(degree, board_size):
+    """Find all chains and cycles of degree-2 boxes, as (boxes, is_cycle) pairs."""
+    coords, neighbors, _ = chain_tables(*board_size)
+    visited = bytearray(len(degree))
     chains = []
     
-    for r in range(height):
-        for c in range(width):
-            if (r, c) not in visited and (r, c) not in game_state["box_owners"]:
-                degree = count_box_degree(game_state, r, c)
-                if degree == 2:
-                    chain = trace_chain(game_state, r, c, visited)
-                    if len(chain) > 0:
-                        chains.append(chain)
+    for start, d in enumerate(degree):
+        if d == 2 and not visited[start]:
+            chains.append(trace_chain(degree, coords, neighbors, start, visited))
     
     return chains
 
 
-def trace_chain(game_state, start_r, start_c, visited):
-    """Trace a chain of degree-2 boxes."""
+def trace_chain(degree, coords, neighbors, start, visited):
+    """Trace a chain of degree-2 boxes from box id start.
+    
+    Returns (boxes, is_cycle) with the (r, c) boxes in walk order. The chain is a cycle
+    when the walk ends next to the box it started from, which takes at least 4 boxes.
+    """
     chain = []
-    current = (start_r, start_c)
+    current = start
+    last = start
     
-    while current and current not in visited:
-        r, c = current
-        if count_box_degree(game_state, r, c) != 2:
-            break
-        
-        visited.add(current)
-        chain.append(current)
+    while current is not None:
+        visited[current] = 1
+        chain.append(coords[current])
+        last = current
         
-        current = find_next_in_chain(game_state, r, c, visited)
-    
-    return chain
+        # Find the next box in the chain: the first unvisited degree-2 neighbour
+        next_box = None
+        for n in neighbors[current]:
+            if degree[n] == 2 and not visited[n]:
+                next_box = n
+                break
+        current = next_box
+    
+    return chain, len(chain) >= 4 and start in neighbors[last]
 
 
-def find_next_in_chain(game_state, r, c, visited):
-    """Find the next box in a chain of degree-2 boxes."""
+def box_degrees(game_state):
+    """Missing-edge count of every box as a flat list indexed r * width + c,
+    with claimed boxes counted as 0 (see count_box_degree)."""
     width, height = game_state["board_size"]
-    neighbors = [(r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)]
-    
-    for nr, nc in neighbors:
-        if (0 <= nr < height and 0 <= nc < width and
-            (nr, nc) not in visited and
-            (nr, nc) not in game_state["box_owners"] and
-            count_box_degree(game_state, nr, nc) == 2):
-            return (nr, nc)
-    
-    return None
+    lines = packed_lines(game_state)
+    degree = [4 - (lines & mask).bit_count() for mask in box_side_masks(width, height)]
+    for r, c in game_state["box_owners"]:
+        degree[r * width + c] = 0
+    return degree
 
 
-def is_cycle(game_state, chain):
-    """Check if a chain forms a cycle."""
-    if len(chain) < 4:
-        return False
-    
-    first = chain[0]
-    last = chain[-1]
-    
-    # Check if first and last boxes are adjacent
-    return abs(first[0] - last[0]) + abs(first[1] - last[1]) == 1
+def move_boxes(board_size, move):
+    """Flat indices (r * width + c) of the boxes on either side of a move's line."""
+    return chain_tables(*board_size)[2][move]
 
 
 def count_box_degree(game_state, r, c):
@@ -313,75 +524,5 @@ def count_box_degree(game_state, r, c):
     if (r, c) in game_state["box_owners"]:
         return 0
     
-    h_lines = game_state["horizontal_lines"]
-    v_lines = game_state["vertical_lines"]
-    
-    missing = 0
-    if (r, c) not in h_lines:
-        missing += 1
-    if (r + 1, c) not in h_lines:
-        missing += 1
-    if (r, c) not in v_lines:
-        missing += 1
-    if (r, c + 1) not in v_lines:
-        missing += 1
-    
-    return missing
-
-
-def count_boxes_completed(game_state, move):
-    """Count how many boxes a move would complete."""
-    r, c, orientation = move
-    width, height = game_state["board_size"]
-    h_lines = game_state["horizontal_lines"]
-    v_lines = game_state["vertical_lines"]
-    
-    completed = 0
-    
-    if orientation == 'H':
-        # Check box below
-        if r < height and (r, c) not in game_state["box_owners"]:
-            if ((r + 1, c) in h_lines and 
-                (r, c) in v_lines and 
-                (r, c + 1) in v_lines):
-                completed += 1
-        # Check box above
-        if r > 0 and (r - 1, c) not in game_state["box_owners"]:
-            if ((r - 1, c) in h_lines and 
-                (r - 1, c) in v_lines and 
-                (r - 1, c + 1) in v_lines):
-                completed += 1
-    else:  # 'V'
-        # Check box to the right
-        if c < width and (r, c) not in game_state["box_owners"]:
-            if ((r, c) in h_lines and 
-                (r + 1, c) in h_lines and 
-                (r, c + 1) in v_lines):
-                completed += 1
-        # Check box to the left
-        if c > 0 and (r, c - 1) not in game_state["box_owners"]:
-            if ((r, c - 1) in h_lines and 
-                (r + 1, c - 1) in h_lines and 
-                (r, c - 1) in v_lines):
-                completed += 1
-    
-    return completed
-
-
-def simulate_move(game_state, move, my_player_id):
-    """Create a new game state with the move applied."""
-    new_state = {
-        "board_size": game_state["board_size"],
-        "horizontal_lines": copy.deepcopy(game_state["horizontal_lines"]),
-        "vertical_lines": copy.deepcopy(game_state["vertical_lines"]),
-        "box_owners": copy.deepcopy(game_state["box_owners"]),
-        "your_player_id": my_player_id
-    }
-    
-    r, c, orientation = move
-    if orientation == 'H':
-        new_state["horizontal_lines"].add((r, c))
-    else:
-        new_state["vertical_lines"].add((r, c))
-    
-    return new_state
\ No newline at end of file
+    mask = box_side_masks(width, height)[r * width + c]
+    return 4 - (packed_lines(game_state) & mask).bit_count()
@@ -1,36 +1,45 @@
 import random
 
-def count_sides(r, c, game_state):
-    """Helper function to count existing sides of a box at (r, c)."""
-    count = 0
-    if (r, c) in game_state["horizontal_lines"]: count += 1
-    if (r + 1, c) in game_state["horizontal_lines"]: count += 1
-    if (r, c) in game_state["vertical_lines"]: count += 1
-    if (r, c + 1) in game_state["vertical_lines"]: count += 1
-    return count
+_tables = {}
+
+def board_tables(width, height):
+    """Returns (total_h, move_boxes) for a board size, built once and cached.
+
+    Lines are packed into one int like DotsAndBoxesGame's edges: horizontal line (r, c)
+    is bit r*width + c and vertical line (r, c) is bit total_h + r*(width+1) + c.
+    move_boxes[move] holds the packed four-side mask of each box the line borders.
+    """
+    key = (width, height)
+    if key not in _tables:
+        total_h = width * (height + 1)
+        box_masks = {}
+        for r in range(height):
+            for c in range(width):
+                box_masks[(r, c)] = ((1 << (r * width + c)) | (1 << ((r + 1) * width + c)) |
+                                     (1 << (total_h + r * (width + 1) + c)) |
+                                     (1 << (total_h + r * (width + 1) + c + 1)))
+        move_boxes = {}
+        for r in range(height + 1):
+            for c in range(width):
+                move_boxes[(r, c, 'H')] = tuple(box_masks[b] for b in ((r, c), (r - 1, c)) if b in box_masks)
+        for r in range(height):
+            for c in range(width + 1):
+                move_boxes[(r, c, 'V')] = tuple(box_masks[b] for b in ((r, c), (r, c - 1)) if b in box_masks)
+        _tables[key] = (total_h, move_boxes)
+    return _tables[key]
 
 def make_move(game_state):
     """
     A greedy bot that takes a winning move if available, otherwise plays randomly.
     """
     available_moves = game_state["available_moves"]
-    
+    total_h, move_boxes = board_tables(*game_state["board_size"])
+    lines = game_state["h_bits"] | (game_state["v_bits"] << total_h)
+
     # Search for a move that completes a box (i.e., is the 4th side)
     for move in available_moves:
-        r, c, orientation = move
-        if orientation == 'H':
-            # Check box below
-            if r < game_state["board_size"][1] and count_sides(r, c, game_state) == 3:
-                return move
-            # Check box above
-            if r > 0 and count_sides(r - 1, c, game_state) == 3:
-                return move
-        else: # 'V'
-            # Check box to the right
-            if c < game_state["board_size"][0] and count_sides(r, c, game_state) == 3:
-                return move
-            # Check box to the left
-            if c > 0 and count_sides(r, c - 1, game_state) == 3:
+        for mask in move_boxes[move]:
+            if (lines & mask).bit_count() == 3:
                 return move
 
     # If no winning move is found, just pick a random one.
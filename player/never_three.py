@@ -1,80 +1,65 @@
 from __future__ import annotations
 import random
-from typing import Dict, List, Set, Tuple
+from typing import Dict, List, Tuple
 
 Move = Tuple[int, int, str]
 Coord = Tuple[int, int]
 
-def count_sides(r: int, c: int, state: Dict) -> int:
-    """
-    Return the number of existing sides of the box at (r, c).
-    Sides:
-      top:    ('H', r,   c)
-      bottom: ('H', r+1, c)
-      left:   ('V', r,   c)
-      right:  ('V', r,   c+1)
-    """
-    h: Set[Coord] = state["horizontal_lines"]
-    v: Set[Coord] = state["vertical_lines"]
-    cnt = 0
-    if (r, c) in h: cnt += 1
-    if (r + 1, c) in h: cnt += 1
-    if (r, c) in v: cnt += 1
-    if (r, c + 1) in v: cnt += 1
-    return cnt
+_tables: Dict[Tuple[int, int], Tuple[int, List[int], Dict[Move, Tuple[int, int]]]] = {}
 
-def adjacent_boxes(move: Move, state: Dict) -> List[Coord]:
+def board_tables(width: int, height: int) -> Tuple[int, List[int], Dict[Move, Tuple[int, int]]]:
     """
-    Return boxes that share the moved edge.
-    For ('H', r, c): (r, c) and (r-1, c) if in bounds.
-    For ('V', r, c): (r, c) and (r, c-1) if in bounds.
+    Return (total_h, box_masks, move_pair) for a board size, built once and cached.
+    Lines are packed into one int like DotsAndBoxesGame's edges:
+      horizontal line (r, c): bit r*width + c
+      vertical line (r, c):   bit total_h + r*(width+1) + c
+    box_masks[r*width + c] is the packed four-side mask of box (r, c) and
+    move_pair[move] holds the ids of the two boxes that share the line, with
+    -1 standing in for the missing box of a line on the border.
     """
-    r, c, o = move
-    W, H = state["board_size"]
-    boxes: List[Coord] = []
-    if o == "H":
-        if 0 <= r < H and 0 <= c < W:        # box below
-            boxes.append((r, c))
-        if 0 < r <= H and 0 <= c < W:        # box above
-            boxes.append((r - 1, c))
-    else:  # 'V'
-        if 0 <= r < H and 0 <= c < W:        # box right
-            boxes.append((r, c))
-        if 0 <= r < H and 0 < c <= W:        # box left
-            boxes.append((r, c - 1))
-    return boxes
+    key = (width, height)
+    if key not in _tables:
+        total_h = width * (height + 1)
+        box_masks: List[int] = [(1 << (r * width + c)) | (1 << ((r + 1) * width + c)) |
+                                (1 << (total_h + r * (width + 1) + c)) |
+                                (1 << (total_h + r * (width + 1) + c + 1))
+                                for r in range(height) for c in range(width)]
+
+        def box_id(r: int, c: int) -> int:
+            return r * width + c if 0 <= r < height and 0 <= c < width else -1
 
-def boxes_captured_by(move: Move, state: Dict) -> int:
+        move_pair: Dict[Move, Tuple[int, int]] = {}
+        for r in range(height + 1):
+            for c in range(width):
+                move_pair[(r, c, "H")] = (box_id(r, c), box_id(r - 1, c))
+        for r in range(height):
+            for c in range(width + 1):
+                move_pair[(r, c, "V")] = (box_id(r, c), box_id(r, c - 1))
+        _tables[key] = (total_h, box_masks, move_pair)
+    return _tables[key]
+
+def box_sides(state: Dict) -> List[int]:
     """
-    How many adjacent boxes would be completed by playing the move.
-    A box is captured if it currently has exactly 3 sides.
+    Return the number of existing sides of every box, indexed r*width + c,
+    followed by a 0 for the missing box (-1) of border lines.
     """
-    return sum(1 for (br, bc) in adjacent_boxes(move, state)
-                 if count_sides(br, bc, state) == 3)
+    total_h, box_masks, _ = board_tables(*state["board_size"])
+    lines = state["h_bits"] | (state["v_bits"] << total_h)
+    sides = [(lines & mask).bit_count() for mask in box_masks]
+    sides.append(0)
+    return sides
 
-def third_siders_after(move: Move, state: Dict) -> int:
+def score_moves(moves: List[Move], sides: List[int],
+                move_pair: Dict[Move, Tuple[int, int]]) -> Tuple[List[int], List[int]]:
     """
-    How many adjacent boxes would become exactly 3-sided after playing the move.
-    Completing a box (->4) is fine; only new 3-siders are counted.
+    For every move, return how many adjacent boxes it completes (boxes that have
+    exactly 3 sides now) and how many it turns into new 3-siders (boxes with
+    exactly 2 sides now). Completing a box (->4) is fine; only new 3-siders count.
     """
-    r, c, o = move
-    h: Set[Coord] = state["horizontal_lines"]
-    v: Set[Coord] = state["vertical_lines"]
-    # Illegal edge guard
-    if (o == "H" and (r, c) in h) or (o == "V" and (r, c) in v):
-        return 99
-
-    cnt = 0
-    for br, bc in adjacent_boxes(move, state):
-        before = count_sides(br, bc, state)
-        after = before + 1  # the placed edge touches each adjacent box
-        if after == 3:
-            cnt += 1
-    return cnt
-
-def is_safe(move: Move, state: Dict) -> bool:
-    """True if the move does not create any 3-sided boxes."""
-    return third_siders_after(move, state) == 0
+    pairs = [move_pair[m] for m in moves]
+    captures = [(sides[a] == 3) + (sides[b] == 3) for a, b in pairs]
+    thirds = [(sides[a] == 2) + (sides[b] == 2) for a, b in pairs]
+    return captures, thirds
 
 def make_move(game_state: Dict) -> Move:
     """
@@ -86,21 +71,21 @@ def make_move(game_state: Dict) -> Move:
     3) Else choose among forced moves that minimize the number of new 3-siders.
     """
     moves: List[Move] = list(game_state["available_moves"])
+    _, _, move_pair = board_tables(*game_state["board_size"])
+    captures, thirds = score_moves(moves, box_sides(game_state), move_pair)
 
     # 1) Greedy capture lesson: take points immediately.
-    captures = [(boxes_captured_by(m, game_state), m) for m in moves]
-    best_cap = max(captures, key=lambda x: x[0])[0]
+    best_cap = max(captures)
     if best_cap > 0:
-        cand = [m for c, m in captures if c == best_cap]
+        cand = [m for c, m in zip(captures, moves) if c == best_cap]
         return random.choice(cand)
 
     # 2) No captures available: prefer safety.
-    safe_moves = [m for m in moves if is_safe(m, game_state)]
+    safe_moves = [m for s, m in zip(thirds, moves) if s == 0]
     if safe_moves:
         return random.choice(safe_moves)
 
     # 3) Forced: minimize damage (fewest new 3-siders).
-    scored = [(third_siders_after(m, game_state), m) for m in moves]
-    min_thirds = min(s for s, _ in scored)
-    cand = [m for s, m in scored if s == min_thirds]
+    min_thirds = min(thirds)
+    cand = [m for s, m in zip(thirds, moves) if s == min_thirds]
     return random.choice(cand)
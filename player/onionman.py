@@ -1,64 +1,133 @@
 import random
-import copy
-
-def count_sides(r, c, game_state):
-    """Helper function to count existing sides of a box at (r, c)."""
-    count = 0
-    if (r, c) in game_state["horizontal_lines"]:
-        count += 1
-    if (r + 1, c) in game_state["horizontal_lines"]:
-        count += 1
-    if (r, c) in game_state["vertical_lines"]:
-        count += 1
-    if (r, c + 1) in game_state["vertical_lines"]:
-        count += 1
-    return count
+
+_tables = {}
+
+
+def board_tables(width, height):
+    """
+    Return (total_h, move_bit, move_boxes, boxes, edge_move) for a board size, built
+    once and cached. Lines are packed into one int like DotsAndBoxesGame's edges:
+    horizontal line (r, c) is bit r*width + c, vertical line (r, c) is bit
+    total_h + r*(width+1) + c. move_bit[move] is the bit of the move's line and
+    move_boxes[move] lists ((r, c), side_mask) for the boxes the line is a side of.
+    boxes lists ((r, c), side_mask) for every box and edge_move[i] is the move of bit i.
+    """
+    key = (width, height)
+    if key not in _tables:
+        total_h = width * (height + 1)
+        box_masks = {}
+        for r in range(height):
+            for c in range(width):
+                box_masks[(r, c)] = ((1 << (r * width + c)) | (1 << ((r + 1) * width + c)) |
+                                     (1 << (total_h + r * (width + 1) + c)) |
+                                     (1 << (total_h + r * (width + 1) + c + 1)))
+        move_bit = {}
+        move_boxes = {}
+        for r in range(height + 1):
+            for c in range(width):
+                move_bit[(r, c, 'H')] = 1 << (r * width + c)
+                move_boxes[(r, c, 'H')] = [(b, box_masks[b]) for b in ((r - 1, c), (r, c)) if b in box_masks]
+        for r in range(height):
+            for c in range(width + 1):
+                move_bit[(r, c, 'V')] = 1 << (total_h + r * (width + 1) + c)
+                move_boxes[(r, c, 'V')] = [(b, box_masks[b]) for b in ((r, c - 1), (r, c)) if b in box_masks]
+        edge_move = sorted(move_bit, key=move_bit.get)
+        _tables[key] = (total_h, move_bit, move_boxes, list(box_masks.items()), edge_move)
+    return _tables[key]
+
+
+def new_search_state(game_state):
+    """
+    Copy the containers a search mutates, once per search. Moves are then
+    applied in place and taken back through the state's undo log.
+    """
+    total_h, move_bit, move_boxes, boxes, edge_move = board_tables(*game_state["board_size"])
+    return {
+        "board_size": game_state["board_size"],
+        "lines": game_state["h_bits"] | (game_state["v_bits"] << total_h),
+        "move_bit": move_bit,
+        "move_boxes": move_boxes,
+        "boxes": boxes,
+        "edge_move": edge_move,
+        "box_owners": dict(game_state["box_owners"]),
+        "available_moves": list(game_state["available_moves"]),
+        "move_index": {move: i for i, move in enumerate(game_state["available_moves"])},
+        "next_player": game_state["your_player_id"],
+        "undo_log": [],
+    }
 
 
 def apply_move_inplace(state, move, player_id):
     """Apply a move to the state in-place and return number of boxes completed."""
-    r, c, o = move
-    if o == 'H':
-        state["horizontal_lines"].add((r, c))
-    else:
-        state["vertical_lines"].add((r, c))
+    state["lines"] |= state["move_bit"][move]
+    lines = state["lines"]
 
-    if move in state["available_moves"]:
-        state["available_moves"].remove(move)
+    # Fill the move's slot with the last move, remembering the slot so undo can swap back
+    moves = state["available_moves"]
+    index = state["move_index"].pop(move)
+    last = moves.pop()
+    if index < len(moves):
+        moves[index] = last
+        state["move_index"][last] = index
 
-    completed = 0
-    width, height = state["board_size"]
-    affected = []
-    if o == 'H':
-        affected = [(r - 1, c), (r, c)]
-    else:
-        affected = [(r, c - 1), (r, c)]
+    completed = []
+    for box, mask in state["move_boxes"][move]:
+        if lines & mask == mask and box not in state["box_owners"]:
+            state["box_owners"][box] = player_id
+            completed.append(box)
 
-    for br, bc in affected:
-        if 0 <= br < height and 0 <= bc < width:
-            if count_sides(br, bc, state) == 4 and (br, bc) not in state["box_owners"]:
-                state["box_owners"][(br, bc)] = player_id
-                completed += 1
+    state["undo_log"].append((move, index, completed, state["next_player"]))
 
     # Determine next player
-    state["next_player"] = player_id if completed > 0 else 3 - player_id
-    return completed
+    state["next_player"] = player_id if completed else 3 - player_id
+    return len(completed)
+
+
+def undo_move_inplace(state):
+    """Take back the most recent move applied with apply_move_inplace."""
+    move, index, completed, prev_player = state["undo_log"].pop()
+    state["lines"] &= ~state["move_bit"][move]
+    moves = state["available_moves"]
+    if index < len(moves):
+        # Undo is last in, first out, so the move now in the slot was the last one
+        state["move_index"][moves[index]] = len(moves)
+        moves.append(moves[index])
+        moves[index] = move
+    else:
+        moves.append(move)
+    state["move_index"][move] = index
+    for box in completed:
+        state["box_owners"].pop(box)
+    state["next_player"] = prev_player
+
+
+def undo_to(state, mark):
+    """Take back moves until the undo log is `mark` entries long again."""
+    while len(state["undo_log"]) > mark:
+        undo_move_inplace(state)
 
 
 def simulate_greedy_exhaust(state, greedy_player_id):
-    """Simulate a greedy opponent repeatedly taking any available 3-sided boxes."""
-    while True:
-        moved = False
-        for mv in list(state["available_moves"]):
-            # Check if this move completes a box
-            s_test = copy.deepcopy(state)
-            completed = apply_move_inplace(s_test, mv, greedy_player_id)
-            if completed > 0:
-                apply_move_inplace(state, mv, greedy_player_id)
-                moved = True
-                break
-        if not moved:
-            break
+    """
+    Simulate a greedy opponent repeatedly taking any available 3-sided boxes.
+    Taking a box only adds lines, so the boxes that end up taken don't depend on
+    the order. After the first sweep, only the boxes beside each line drawn can
+    become 3-sided, so those are the only ones queued.
+    """
+    owners = state["box_owners"]
+    lines = state["lines"]
+    ready = [(box, mask) for box, mask in state["boxes"]
+             if (lines & mask).bit_count() == 3 and box not in owners]
+    while ready:
+        box, mask = ready.pop()
+        if box in owners:
+            continue  # completed along with a neighbour by a line they share
+        move = state["edge_move"][(mask & ~state["lines"]).bit_length() - 1]
+        apply_move_inplace(state, move, greedy_player_id)
+        lines = state["lines"]
+        for nbox, nmask in state["move_boxes"][move]:
+            if (lines & nmask).bit_count() == 3 and nbox not in owners:
+                ready.append((nbox, nmask))
     return state
 
 
@@ -78,21 +147,17 @@ def find_best_exploit_move(game_state):
     best_move = None
     best_score = -float("inf")
 
-    for mv in list(game_state["available_moves"]):
-        s_copy = copy.deepcopy(game_state)
-        apply_move_inplace(s_copy, mv, me)
-        next_player = s_copy.get("next_player", me)
-
-        if next_player != me:
-            s_after = simulate_greedy_exhaust(s_copy, next_player)
-        else:
-            s_after = copy.deepcopy(s_copy)
-            s_after = simulate_greedy_exhaust(s_after, 3 - me)
+    state = new_search_state(game_state)
+    for mv in list(state["available_moves"]):
+        apply_move_inplace(state, mv, me)
+        # Whether or not our move scored, the greedy opponent eats what it can next
+        simulate_greedy_exhaust(state, 3 - me)
 
-        sc = score_state_for_player(s_after, me)
+        sc = score_state_for_player(state, me)
         if sc > best_score:
             best_score = sc
             best_move = mv
+        undo_to(state, 0)
 
     return best_move
 
@@ -1,91 +1,220 @@
 import random
-import copy
 import math
+import threading
 from collections import defaultdict
 
+ITERATIONS = 1000  # You can tune this
+# worker processes for the search; 1 runs every iteration in this process. Above 1, each
+# worker grows its own tree with an equal share of ITERATIONS and the root visit counts
+# of all trees are summed (see root_parallel_move). The workers come from fork_pool.py
+# beside game_match.py, and only where processes can fork
+ROOT_WORKERS = 1
+# threads sharing one tree; 1 runs the plain serial loop. Above 1, each thread selects,
+# expands and backpropagates under one lock with a virtual loss on its path, and runs its
+# rollout outside the lock (see run_mcts_threaded). Rollouts are pure Python, so they only
+# overlap on an interpreter without the GIL; ROOT_WORKERS uses more cores on a regular one
+TREE_THREADS = 1
+# at or below this many free lines, make_move solves the position exactly (see endgame_move)
+# instead of sampling it; 16 lines take up to about a tenth of a second on a 5x5 board
+ENDGAME_MOVES = 16
+INF = float("inf")
+
 class MCTSNode:
-    def __init__(self, state, parent=None, move=None):
-        self.state = state
-        self.parent = parent
-        self.move = move
+    # One node is allocated per iteration, so keep them small and cheap to create
+    __slots__ = ("n_untried", "untried", "child_moves", "children", "visits", "value",
+                 "vloss", "mean", "inv_sqrt_visits", "sqrt_log_visits")
+
+    def __init__(self, num_moves):
+        # Moves not expanded yet: how many, and (from the first expansion on) which, in
+        # random order; the list is dropped once the last one is expanded
+        self.n_untried = num_moves
+        self.untried = None
+        # child_moves[i] leads to children[i]. Transposed positions share one node (see
+        # position_key), so a node can be the child of several parents and has no parent link
+        self.child_moves = []
         self.children = []
         self.visits = 0
         self.value = 0.0
+        self.vloss = 0  # rollouts in flight below this node, counted as losses until they finish
+        # value / visits, 1 / sqrt(visits) and sqrt(log(visits + 1)), kept up to date by
+        # backpropagate for best_child
+        self.mean = 0.0
+        self.inv_sqrt_visits = 0.0
+        self.sqrt_log_visits = 0.0
 
     def is_fully_expanded(self):
-        return len(self.children) == len(self.state["available_moves"])
+        return self.n_untried == 0
 
     def best_child(self, c_param=1.4):
-        """Select child with best UCT score."""
-        choices = []
+        """Select the (move, child) with best UCT score.
+
+        Every child has been visited or carries a virtual loss, since expand's caller
+        backpropagates (or adds the virtual loss) before the next selection.
+        """
+        explore = c_param * self.sqrt_log_visits
+        scores = []
         for child in self.children:
-            if child.visits == 0:
-                uct = float('inf')
+            if child.vloss:
+                visits = child.visits + child.vloss
+                scores.append(((child.value - child.vloss) / visits) + explore / math.sqrt(visits))
             else:
-                uct = (child.value / child.visits) + c_param * math.sqrt(
-                    math.log(self.visits + 1) / (child.visits)
-                )
-            choices.append((uct, child))
-        return max(choices, key=lambda x: x[0])[1]
+                scores.append(child.mean + explore * child.inv_sqrt_visits)
+        i = scores.index(max(scores))
+        return self.child_moves[i], self.children[i]
 
 
-def apply_move_to_state(state, move, player_id):
+_tables = {}
+
+
+def board_tables(width, height):
     """
-    Returns a deep-copied next state after applying `move` by `player_id`.
+    Returns (total_h, move_bit, move_boxes, move_edge) for a board size, built once
+    and cached. Lines are packed into one int like DotsAndBoxesGame's edges: horizontal
+    line (r, c) is bit r*width + c, vertical line (r, c) is bit total_h + r*(width+1) + c.
+    move_bit[move] is the bit of the move's line and move_boxes[move] lists
+    ((r, c), side_mask) for the boxes the line is a side of. move_edge[move] holds the
+    same bit and side masks as one (bit, (mask, ...)) pair for the rollout loop.
     """
-    next_state = copy.deepcopy(state)
-    r, c, orientation = move
-    scored_box = False
+    key = (width, height)
+    if key not in _tables:
+        total_h = width * (height + 1)
+        box_masks = {}
+        for r in range(height):
+            for c in range(width):
+                box_masks[(r, c)] = ((1 << (r * width + c)) | (1 << ((r + 1) * width + c)) |
+                                     (1 << (total_h + r * (width + 1) + c)) |
+                                     (1 << (total_h + r * (width + 1) + c + 1)))
+        move_bit = {}
+        move_boxes = {}
+        for r in range(height + 1):
+            for c in range(width):
+                move_bit[(r, c, "H")] = 1 << (r * width + c)
+                move_boxes[(r, c, "H")] = [(b, box_masks[b]) for b in ((r - 1, c), (r, c)) if b in box_masks]
+        for r in range(height):
+            for c in range(width + 1):
+                move_bit[(r, c, "V")] = 1 << (total_h + r * (width + 1) + c)
+                move_boxes[(r, c, "V")] = [(b, box_masks[b]) for b in ((r, c - 1), (r, c)) if b in box_masks]
+        move_edge = {move: (move_bit[move], tuple(mask for _, mask in boxes))
+                     for move, boxes in move_boxes.items()}
+        _tables[key] = (total_h, move_bit, move_boxes, move_edge)
+    return _tables[key]
 
-    if orientation == "H":
-        next_state["horizontal_lines"].add((r, c))
-    else:
-        next_state["vertical_lines"].add((r, c))
 
-    next_state["available_moves"].remove(move)
+def new_search_state(game_state):
+    """
+    Copies the containers the search mutates, once per search. Every tree walk
+    and rollout applies moves to this one state and undoes them afterwards.
+    """
+    total_h, move_bit, move_boxes, move_edge = board_tables(*game_state["board_size"])
+    scores = [0, 0, 0]  # boxes owned, indexed by player_id
+    for owner in game_state["box_owners"].values():
+        scores[owner] += 1
+    return {
+        "board_size": game_state["board_size"],
+        "lines": game_state["h_bits"] | (game_state["v_bits"] << total_h),
+        "move_bit": move_bit,
+        "move_boxes": move_boxes,
+        "move_edge": move_edge,
+        "box_owners": dict(game_state["box_owners"]),
+        "scores": scores,
+        "available_moves": list(game_state["available_moves"]),
+        "move_index": {move: i for i, move in enumerate(game_state["available_moves"])},
+        "your_player_id": game_state["your_player_id"],
+        "undo_log": [],
+    }
+
+
+def apply_move_to_state(state, move, player_id):
+    """
+    Applies `move` by `player_id` to `state` in place, pushing an undo record.
+    """
+    state["lines"] |= state["move_bit"][move]
+    lines = state["lines"]
+
+    # Fill the move's slot with the last move, remembering the slot so undo can swap back
+    moves = state["available_moves"]
+    index = state["move_index"].pop(move)
+    last = moves.pop()
+    if index < len(moves):
+        moves[index] = last
+        state["move_index"][last] = index
 
     # Check boxes formed by this move
-    potential_boxes = []
-    if orientation == "H":
-        potential_boxes = [(r - 1, c), (r, c)]
-    else:  # 'V'
-        potential_boxes = [(r, c - 1), (r, c)]
-
-    for br, bc in potential_boxes:
-        if 0 <= br < next_state["board_size"][1] and 0 <= bc < next_state["board_size"][0]:
-            top = (br, bc) in next_state["horizontal_lines"]
-            bottom = (br + 1, bc) in next_state["horizontal_lines"]
-            left = (br, bc) in next_state["vertical_lines"]
-            right = (br, bc + 1) in next_state["vertical_lines"]
-            if top and bottom and left and right and (br, bc) not in next_state["box_owners"]:
-                next_state["box_owners"][(br, bc)] = player_id
-                scored_box = True
+    completed = []
+    for box, mask in state["move_boxes"][move]:
+        if lines & mask == mask and box not in state["box_owners"]:
+            state["box_owners"][box] = player_id
+            completed.append(box)
+    state["scores"][player_id] += len(completed)
+
+    state["undo_log"].append((move, index, completed, state["your_player_id"]))
 
     # If no box was completed, switch turns
-    if not scored_box:
-        next_state["your_player_id"] = 3 - player_id
+    if not completed:
+        state["your_player_id"] = 3 - player_id
 
-    return next_state
+    return state
+
+
+def undo_move_from_state(state):
+    """
+    Takes back the most recent move applied with apply_move_to_state.
+    """
+    move, index, completed, prev_player = state["undo_log"].pop()
+    state["lines"] &= ~state["move_bit"][move]
+    moves = state["available_moves"]
+    if index < len(moves):
+        # Undo is last in, first out, so the move now in the slot was the last one
+        state["move_index"][moves[index]] = len(moves)
+        moves.append(moves[index])
+        moves[index] = move
+    else:
+        moves.append(move)
+    state["move_index"][move] = index
+    for box in completed:
+        state["scores"][state["box_owners"].pop(box)] -= 1
+    state["your_player_id"] = prev_player
+
+
+def undo_to(state, mark):
+    """
+    Takes back moves until the undo log is `mark` entries long again.
+    """
+    while len(state["undo_log"]) > mark:
+        undo_move_from_state(state)
 
 
 def rollout(state, starting_player):
     """
     Simulate a random game until the end.
+    The game is played on a local copy of the packed lines and scores, so `state`
+    is left as it was and nothing needs undoing.
     """
-    current_state = copy.deepcopy(state)
+    move_edge = state["move_edge"]
+    lines = state["lines"]
+    scores = state["scores"][:]
     current_player = starting_player
 
-    while current_state["available_moves"]:
-        move = random.choice(current_state["available_moves"])
-        current_state = apply_move_to_state(current_state, move, current_player)
+    # Drawing the free lines in a shuffled order is the same as picking a random move each ply
+    order = state["available_moves"][:]
+    random.shuffle(order)
+    for move in order:
+        bit, masks = move_edge[move]
+        lines |= bit
+        completed = 0
+        for mask in masks:
+            if lines & mask == mask:
+                completed += 1
 
         # If the player didn’t score a box, switch
-        if current_state["your_player_id"] != current_player:
+        if completed:
+            scores[current_player] += completed
+        else:
             current_player = 3 - current_player
 
     # Count boxes
-    player1_boxes = sum(1 for v in current_state["box_owners"].values() if v == 1)
-    player2_boxes = sum(1 for v in current_state["box_owners"].values() if v == 2)
+    player1_boxes = scores[1]
+    player2_boxes = scores[2]
 
     if player1_boxes > player2_boxes:
         return 1
@@ -95,66 +224,297 @@ def rollout(state, starting_player):
         return 0
 
 
-def backpropagate(node, result, player_id):
+def position_key(state):
+    """
+    Transposition key of the search state: the packed lines, the player to move and
+    player 1's score. Player 2's score follows from the lines, so the key is exact.
+    """
+    return (state["lines"], state["your_player_id"], state["scores"][1])
+
+
+def backpropagate(path, result, player_id):
     """
-    Backpropagate rollout results up the tree.
+    Backpropagate rollout results along the path of nodes the iteration walked.
     """
-    while node is not None:
+    for node in path:
         node.visits += 1
         if result == player_id:
             node.value += 1
         elif result == 0:
             node.value += 0.5  # draw
-        node = node.parent
+        node.mean = node.value / node.visits
+        node.inv_sqrt_visits = 1 / math.sqrt(node.visits)
+        node.sqrt_log_visits = math.sqrt(math.log(node.visits + 1))
 
 
-def expand(node, player_id):
+def expand(node, state, player_id, nodes):
     """
-    Expand one unexplored move from this node.
+    Expand one unexplored move from this node, leaving `state` at the new child.
+    If the child's position was already reached by another move order, its node
+    from the transposition table `nodes` is linked in instead of a new one.
     """
-    tried_moves = {child.move for child in node.children}
-    untried_moves = [m for m in node.state["available_moves"] if m not in tried_moves]
-    if not untried_moves:
+    if node.n_untried == 0:
         return node
+    if node.untried is None:
+        # Popping from a shuffled list picks a uniformly random untried move each time
+        node.untried = state["available_moves"][:]
+        random.shuffle(node.untried)
 
-    move = random.choice(untried_moves)
-    new_state = apply_move_to_state(node.state, move, player_id)
-    child_node = MCTSNode(new_state, parent=node, move=move)
+    move = node.untried.pop()
+    node.n_untried -= 1
+    if node.n_untried == 0:
+        node.untried = None
+    apply_move_to_state(state, move, player_id)
+    key = position_key(state)
+    child_node = nodes.get(key)
+    if child_node is None:
+        child_node = nodes[key] = MCTSNode(len(state["available_moves"]))
+    node.child_moves.append(move)
     node.children.append(child_node)
     return child_node
 
 
-def make_move(game_state):
+def select_and_expand(root, state, player_id, nodes):
     """
-    Monte Carlo Tree Search AI for Dots and Boxes.
-    Selects the move with the best simulated win rate.
+    Walks down from the root by UCT and expands the node it stops at, applying
+    the moves on the way to `state`. Returns the path of nodes from the root to
+    the new leaf.
     """
-    root = MCTSNode(copy.deepcopy(game_state))
-    player_id = game_state["your_player_id"]
-    iterations = 1000  # You can tune this
+    node = root
+    path = [node]
 
-    for _ in range(iterations):
-        node = root
-        state = copy.deepcopy(game_state)
+    # Selection
+    while node.children and node.is_fully_expanded():
+        move, node = node.best_child()
+        apply_move_to_state(state, move, player_id)
+        path.append(node)
+
+    # Expansion
+    if state["available_moves"]:
+        node = expand(node, state, player_id, nodes)
+        path.append(node)
+    return path
 
-        # Selection
-        while node.children and node.is_fully_expanded():
-            node = node.best_child()
 
-        # Expansion
-        if node.state["available_moves"]:
-            node = expand(node, player_id)
+def run_mcts(game_state, iterations):
+    """
+    Grows a search tree from `game_state` for `iterations` iterations and returns its root.
+    """
+    if TREE_THREADS > 1:
+        return run_mcts_threaded(game_state, iterations)
+
+    state = new_search_state(game_state)
+    root = MCTSNode(len(state["available_moves"]))
+    player_id = game_state["your_player_id"]
+    nodes = {}  # position_key -> node, shared by every path reaching the position
+
+    for _ in range(iterations):
+        path = select_and_expand(root, state, player_id, nodes)
 
         # Simulation
-        result = rollout(node.state, node.state["your_player_id"])
+        result = rollout(state, state["your_player_id"])
 
         # Backpropagation
-        backpropagate(node, result, player_id)
+        backpropagate(path, result, player_id)
+        undo_to(state, 0)
+
+    return root
 
-    # Choose best child (highest average reward)
-    best_move = max(
-        root.children,
-        key=lambda c: c.value / (c.visits + 1e-6)
-    ).move
 
+def run_mcts_threaded(game_state, iterations):
+    """
+    Grows one search tree from `game_state` with TREE_THREADS threads, each with its
+    own search state. A thread adds a virtual loss to every node on its path while its
+    rollout runs, steering the other threads towards different leaves.
+    """
+    root = MCTSNode(len(game_state["available_moves"]))
+    player_id = game_state["your_player_id"]
+    nodes = {}
+    lock = threading.Lock()
+    remaining = [iterations]
+
+    def worker():
+        state = new_search_state(game_state)
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+                path = select_and_expand(root, state, player_id, nodes)
+                for node in path:
+                    node.vloss += 1
+
+            result = rollout(state, state["your_player_id"])
+
+            with lock:
+                for node in path:
+                    node.vloss -= 1
+                backpropagate(path, result, player_id)
+            undo_to(state, 0)
+
+    threads = [threading.Thread(target=worker) for _ in range(TREE_THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return root
+
+
+def solve_exact(lines, edges, alpha, beta, table):
+    """
+    Net boxes (own minus opponent's) the player to move wins from here on with best
+    play by both sides, searched within (alpha, beta) by negamax with alpha-beta.
+    edges holds the (bit, side masks) pair of every line free at the root and table
+    caches (lower, upper) bounds on the value of each packed `lines` seen. The value
+    does not depend on the score so far or on who is to move, so `lines` is the key.
+    """
+    entry = table.get(lines)
+    if entry is not None:
+        lower, upper = entry
+        if lower >= beta:
+            return lower
+        if upper <= alpha:
+            return upper
+        if lower == upper:
+            return lower
+        alpha = max(alpha, lower)
+        beta = min(beta, upper)
+    else:
+        lower, upper = -INF, INF
+
+    # Order the moves: captures first (most boxes first), then by how few 3-sided boxes they leave
+    children = []
+    for bit, masks in edges:
+        if lines & bit:
+            continue
+        after = lines | bit
+        completed = 0
+        threes = 0
+        for mask in masks:
+            sides = (after & mask).bit_count()
+            if sides == 4:
+                completed += 1
+            elif sides == 3:
+                threes += 1
+        children.append((-completed, threes, after, completed))
+    if not children:
+        return 0
+    children.sort()
+
+    best = -INF
+    a = alpha
+    for _, _, after, completed in children:
+        # Completing a box keeps the turn, anything else hands it over
+        if completed:
+            value = completed + solve_exact(after, edges, a - completed, beta - completed, table)
+        else:
+            value = -solve_exact(after, edges, -beta, -a, table)
+        if value > best:
+            best = value
+            if value > a:
+                a = value
+                if a >= beta:
+                    break
+
+    if best <= alpha:
+        table[lines] = (lower, best)
+    elif best >= beta:
+        table[lines] = (best, upper)
+    else:
+        table[lines] = (best, best)
+    return best
+
+
+def endgame_move(game_state):
+    """
+    Best move by exact alpha-beta search (see solve_exact), for positions with at most
+    ENDGAME_MOVES free lines, where random rollouts are slower and noisier than solving.
+    """
+    total_h, _, _, move_edge = board_tables(*game_state["board_size"])
+    lines = game_state["h_bits"] | (game_state["v_bits"] << total_h)
+    moves = game_state["available_moves"]
+    edges = [move_edge[move] for move in moves]
+    table = {}
+
+    children = []
+    for move in moves:
+        bit, masks = move_edge[move]
+        after = lines | bit
+        children.append((sum(after & mask == mask for mask in masks), after, move))
+    # Try captures first so the window closes early
+    children.sort(key=lambda child: -child[0])
+
+    best_move = children[0][2]
+    best = -INF
+    for completed, after, move in children:
+        if completed:
+            value = completed + solve_exact(after, edges, best - completed, INF, table)
+        else:
+            value = -solve_exact(after, edges, -INF, -best, table)
+        if value > best:
+            best = value
+            best_move = move
     return best_move
+
+
+def make_move(game_state):
+    """
+    Monte Carlo Tree Search AI for Dots and Boxes.
+    Selects the move with the best simulated win rate, or solves the
+    position exactly once few enough lines are left.
+    """
+    if len(game_state["available_moves"]) <= ENDGAME_MOVES:
+        return endgame_move(game_state)
+
+    if ROOT_WORKERS > 1 and len(game_state["available_moves"]) > 1:
+        move = root_parallel_move(game_state)
+        if move is not None:
+            return move
+
+    root = run_mcts(game_state, ITERATIONS)
+
+    # Choose best child (highest average reward)
+    scores = [child.value / (child.visits + 1e-6) for child in root.children]
+    return root.child_moves[scores.index(max(scores))]
+
+
+# Parallel root search -------------------------------------------------------
+
+def start_root_pool(task):
+    """
+    ROOT_WORKERS forked processes running task for one search, or None where
+    processes can't fork.
+    """
+    # Imported here so the file still stands alone while ROOT_WORKERS is 1
+    from fork_pool import ForkPool, available
+    return ForkPool(ROOT_WORKERS, task) if available() else None
+
+
+def root_child_stats(seed, game_state, iterations):
+    """
+    Worker side of the root-parallel search: grows one tree with its own random
+    seed and returns {move: (visits, value)} for the children of its root.
+    """
+    random.seed(seed)
+    root = run_mcts(game_state, iterations)
+    return {move: (child.visits, child.value) for move, child in zip(root.child_moves, root.children)}
+
+
+def root_parallel_move(game_state):
+    """
+    Grows ROOT_WORKERS independent trees at once and picks the move with the most
+    visits summed over all of them. The trees share nothing, so no locking is needed.
+    Returns None if there are no workers, and make_move then searches serially.
+    """
+    iterations = -(-ITERATIONS // ROOT_WORKERS)
+    pool = start_root_pool(lambda seed: root_child_stats(seed, game_state, iterations))
+    if pool is None:
+        return None
+    with pool:
+        futures = [pool.submit_task(random.getrandbits(64)) for _ in range(ROOT_WORKERS)]
+
+        visits = defaultdict(int)
+        for future in futures:
+            for move, (child_visits, _) in future.result().items():
+                visits[move] += child_visits
+    return max(visits, key=visits.get)
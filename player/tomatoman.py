@@ -1,175 +1,263 @@
 # super_bot.py
 import random
-import copy
 import math
-from functools import lru_cache
+from collections import defaultdict
+
+INF = 10**9
+# worker processes for MCTS; 1 runs every iteration in this process. Above 1, each worker
+# grows its own tree with an equal share of the iterations and the root visit counts of
+# all trees are summed (see root_parallel_move). The workers come from fork_pool.py beside
+# game_match.py, and only where processes can fork
+ROOT_WORKERS = 1
 
 # ---------------------------
 # Internal helpers (self-contained)
 # ---------------------------
 
-def count_sides(r, c, state):
-    """Count sides of box at (r, c)."""
-    cnt = 0
-    if (r, c) in state["horizontal_lines"]:
-        cnt += 1
-    if (r + 1, c) in state["horizontal_lines"]:
-        cnt += 1
-    if (r, c) in state["vertical_lines"]:
-        cnt += 1
-    if (r, c + 1) in state["vertical_lines"]:
-        cnt += 1
-    return cnt
+_tables = {}
+
+def board_tables(width, height):
+    """Return (total_h, move_bit, move_boxes, edge_masks, box_masks) for a board size, built once and cached.
+    Lines are packed into one int like DotsAndBoxesGame's edges: horizontal line (r, c)
+    is bit r*width + c, vertical line (r, c) is bit total_h + r*(width+1) + c.
+    Box (r, c) has id r*width + c, which is also its bit in an owner mask.
+    move_bit[move] is the bit of the move's line and move_boxes[move] lists the ids of
+    the boxes the line is a side of. box_masks[id] is the packed mask of a box's four
+    sides and edge_masks[i] holds the side masks of the boxes beside the line of bit i."""
+    key = (width, height)
+    if key not in _tables:
+        total_h = width * (height + 1)
+        box_masks = [(1 << (r * width + c)) | (1 << ((r + 1) * width + c)) |
+                     (1 << (total_h + r * (width + 1) + c)) |
+                     (1 << (total_h + r * (width + 1) + c + 1))
+                     for r in range(height) for c in range(width)]
+
+        def box_ids(*boxes):
+            return tuple(r * width + c for r, c in boxes if 0 <= r < height and 0 <= c < width)
+
+        move_bit = {}
+        move_boxes = {}
+        for r in range(height + 1):
+            for c in range(width):
+                move_bit[(r, c, 'H')] = 1 << (r * width + c)
+                move_boxes[(r, c, 'H')] = box_ids((r - 1, c), (r, c))
+        for r in range(height):
+            for c in range(width + 1):
+                move_bit[(r, c, 'V')] = 1 << (total_h + r * (width + 1) + c)
+                move_boxes[(r, c, 'V')] = box_ids((r, c - 1), (r, c))
+        edge_masks = [tuple(box_masks[box] for box in move_boxes[mv])
+                      for mv in sorted(move_bit, key=move_bit.get)]
+        _tables[key] = (total_h, move_bit, move_boxes, edge_masks, box_masks)
+    return _tables[key]
+
+def new_state(game_state):
+    """Build the bot's own state from the game_state it is handed:
+      "lines": packed lines (see board_tables)
+      "sides": number of drawn sides of each box, by box id
+      "owned": [unused, boxes of player 1, boxes of player 2] as owner masks
+      "move_index": position of each move in available_moves (see set_moves)
+    plus board_size, your_player_id, next_player and available_moves."""
+    width, height = game_state["board_size"]
+    total_h, _, _, _, box_masks = board_tables(width, height)
+    lines = game_state["h_bits"] | (game_state["v_bits"] << total_h)
+    owned = [0, 0, 0]
+    for (r, c), owner in game_state["box_owners"].items():
+        owned[owner] |= 1 << (r * width + c)
+    state = {
+        "board_size": game_state["board_size"],
+        "your_player_id": game_state["your_player_id"],
+        "next_player": game_state.get("next_player", game_state["your_player_id"]),
+        "lines": lines,
+        "sides": [(lines & mask).bit_count() for mask in box_masks],
+        "owned": owned,
+    }
+    set_moves(state, game_state["available_moves"])
+    return state
+
+def set_moves(state, moves):
+    """Make moves the state's available_moves. move_index maps each move to its
+    position in the list so a move can be removed in O(1) by moving the last move
+    into its slot, while random.choice can still pick from the list."""
+    state["available_moves"] = list(moves)
+    state["move_index"] = {move: i for i, move in enumerate(moves)}
+
+def clone_state(state):
+    """Copy a state for simulation. Only the containers a move changes are rebuilt;
+    every other field is immutable and shared with the original."""
+    s = dict(state)
+    s["sides"] = state["sides"][:]
+    s["owned"] = state["owned"][:]
+    s["available_moves"] = state["available_moves"][:]
+    s["move_index"] = state["move_index"].copy()
+    return s
 
 def canonical_key(state):
-    """Create a compact, hashable key for memoization from the game state.
-    Uses frozensets of lines and frozenset of owned boxes items, plus next_player."""
-    h = frozenset(state["horizontal_lines"])
-    v = frozenset(state["vertical_lines"])
-    b = frozenset(state["box_owners"].items())
-    next_p = state.get("next_player", state["your_player_id"])
-    return (h, v, b, next_p)
+    """Create a compact, hashable key for memoization from the game state: one int
+    holding the packed lines, then player 1's and player 2's owner masks, then
+    next_player, like DotsAndBoxesGame.pack(). Unlike a hash it can't collide."""
+    _, _, _, edge_masks, box_masks = board_tables(*state["board_size"])
+    num_edges = len(edge_masks)
+    num_boxes = len(box_masks)
+    owned = state["owned"]
+    return (state["lines"] | (owned[1] << num_edges) | (owned[2] << (num_edges + num_boxes)) |
+            (state["next_player"] << (num_edges + 2 * num_boxes)))
 
 def apply_move(state, move, player_id):
     """Return a new copied state after applying move by player_id and whether it completed any box(s)."""
-    s = copy.deepcopy(state)
-    r, c, o = move
-    completed = 0
-
-    if o == 'H':
-        s["horizontal_lines"].add((r, c))
-    else:
-        s["vertical_lines"].add((r, c))
-
-    if move in s["available_moves"]:
-        s["available_moves"].remove(move)
+    s = clone_state(state)
+    completed = apply_move_inplace(s, move, player_id)
+    return s, completed
 
-    width, height = s["board_size"]
-    affected = []
-    if o == 'H':
-        affected = [(r - 1, c), (r, c)]
-    else:
-        affected = [(r, c - 1), (r, c)]
+def apply_move_inplace(s, move, player_id):
+    """Apply move by player_id to state s itself and return how many boxes it completed."""
+    completed = 0
 
-    for br, bc in affected:
-        if 0 <= br < height and 0 <= bc < width:
-            if count_sides(br, bc, s) == 4 and (br, bc) not in s["box_owners"]:
-                s["box_owners"][(br, bc)] = player_id
-                completed += 1
+    _, move_bit, move_boxes, _, _ = board_tables(*s["board_size"])
+    s["lines"] |= move_bit[move]
+
+    index = s["move_index"].pop(move, None)
+    if index is not None:
+        moves = s["available_moves"]
+        last = moves.pop()
+        if index < len(moves):
+            moves[index] = last
+            s["move_index"][last] = index
+
+    # The new line is one more side for each box beside it
+    sides = s["sides"]
+    for box in move_boxes[move]:
+        sides[box] += 1
+        if sides[box] == 4:
+            s["owned"][player_id] |= 1 << box
+            completed += 1
 
     # next_player handling: if completed at least one box, same player continues
     s["next_player"] = player_id if completed > 0 else 3 - player_id
-    return s, completed
+    return completed
 
 # ---------------------------
 # Exact solver (negamax-like) for small endgames
 # ---------------------------
-def solve_exact(state):
+def _solve(lines, full, edge_masks, alpha, beta, table):
+    """Best net boxes still to come for the player to move, given the packed lines,
+    searched within (alpha, beta) with alpha-beta.
+    Who owns the boxes taken so far doesn't change what the rest of the game is worth,
+    so table keeps (lower, upper) bounds keyed by the lines alone."""
+    if lines == full:
+        # game over: no boxes left to take
+        return 0
+    entry = table.get(lines)
+    if entry is not None:
+        lower, upper = entry
+        if lower >= beta:
+            return lower
+        if upper <= alpha:
+            return upper
+        if lower == upper:
+            return lower
+        alpha = max(alpha, lower)
+        beta = min(beta, upper)
+    else:
+        lower, upper = -INF, INF
+
+    # Order the moves: captures first, then safe lines, then lines handing over a 3-sided box
+    children = []
+    free = full & ~lines
+    while free:
+        bit = free & -free
+        free ^= bit
+        after = lines | bit
+        completed = 0
+        threes = 0
+        for mask in edge_masks[bit.bit_length() - 1]:
+            sides = (after & mask).bit_count()
+            if sides == 4:
+                completed += 1
+            elif sides == 3:
+                threes += 1
+        children.append((-completed, threes, after, completed))
+    children.sort()
+
+    best = -INF
+    a = alpha
+    for _, _, after, completed in children:
+        if completed > 0:
+            val = completed + _solve(after, full, edge_masks, a - completed, beta - completed, table)
+        else:
+            # opponent to move; value is negative of their score difference
+            val = -_solve(after, full, edge_masks, -beta, -a, table)
+
+        if val > best:
+            best = val
+            if val > a:
+                a = val
+                if a >= beta:
+                    break  # the opponent won't allow this line, so skip the rest
+
+    if best <= alpha:
+        table[lines] = (lower, best)
+    elif best >= beta:
+        table[lines] = (best, upper)
+    else:
+        table[lines] = (best, best)
+    return best
+
+def solve_exact(state, table=None, alpha=-INF, beta=INF):
     """Return the score difference (current_player_boxes - opponent_boxes) assuming perfect play
     for the remainder of the game from the perspective of the player who is about to move.
     This uses recursion with memoization and the typical Dots & Boxes negamax transformation:
       - If a move completes k boxes, reward k + solve(new_state)
       - Otherwise the value is -solve(new_state)
+    Pass the same table to calls on one board to share the positions already solved.
+    Outside (alpha, beta) the result is only a bound: at most alpha or at least beta.
     """
+    _, _, _, edge_masks, _ = board_tables(*state["board_size"])
+    full = (1 << len(edge_masks)) - 1
+    if table is None:
+        table = {}
 
-    @lru_cache(maxsize=None)
-    def _solve(hfro, vfro, boxfro, next_player, width, height):
-        # Reconstruct minimal state
-        horizontal = set(hfro)
-        vertical = set(vfro)
-        box_owners = dict(boxfro)
-        # compute available moves
-        avail = []
-        # horizontal moves: r from 0..height, c from 0..width-1
-        for r in range(0, height + 1):
-            for c in range(0, width):
-                mv = (r, c, 'H')
-                if mv not in horizontal:
-                    avail.append(mv)
-        for r in range(0, height):
-            for c in range(0, width + 1):
-                mv = (r, c, 'V')
-                if mv not in vertical:
-                    avail.append(mv)
-
-        if not avail:
-            # game over: compute final difference for next_player perspective
-            p_boxes = sum(1 for v in box_owners.values() if v == next_player)
-            o_boxes = sum(1 for v in box_owners.values() if v == 3 - next_player)
-            return p_boxes - o_boxes
-
-        best = -10**9
-        # try all moves
-        for mv in avail:
-            r, c, o = mv
-            completed = 0
-            # apply move locally
-            if o == 'H':
-                horizontal2 = set(horizontal)
-                horizontal2.add(mv)
-                vertical2 = set(vertical)
-            else:
-                vertical2 = set(vertical)
-                vertical2.add(mv)
-                horizontal2 = set(horizontal)
-
-            box2 = dict(box_owners)
-            affected = []
-            if o == 'H':
-                affected = [(r - 1, c), (r, c)]
-            else:
-                affected = [(r, c - 1), (r, c)]
-
-            for br, bc in affected:
-                if 0 <= br < height and 0 <= bc < width:
-                    top = (br, bc) in horizontal2
-                    bottom = (br + 1, bc) in horizontal2
-                    left = (br, bc) in vertical2
-                    right = (br, bc + 1) in vertical2
-                    if top and bottom and left and right and (br, bc) not in box2:
-                        box2[(br, bc)] = next_player
-                        completed += 1
-
-            if completed > 0:
-                val = completed + _solve(frozenset(horizontal2), frozenset(vertical2), frozenset(box2.items()), next_player, width, height)
-            else:
-                # opponent to move; value is negative of their score difference
-                val_op = _solve(frozenset(horizontal2), frozenset(vertical2), frozenset(box2.items()), 3 - next_player, width, height)
-                val = -val_op
-
-            if val > best:
-                best = val
-                # alpha-beta could be added but for very small spaces it's fine
-
-        return best
-
-    hfro = frozenset(state["horizontal_lines"])
-    vfro = frozenset(state["vertical_lines"])
-    boxfro = frozenset(state["box_owners"].items())
-    next_player = state.get("next_player", state["your_player_id"])
-    w, h = state["board_size"]
-    return _solve(hfro, vfro, boxfro, next_player, w, h)
+    next_player = state["next_player"]
+    owned = state["owned"]
+    current = owned[next_player].bit_count() - owned[3 - next_player].bit_count()
+    return current + _solve(state["lines"], full, edge_masks, alpha - current, beta - current, table)
 
 # ---------------------------
 # MCTS implementation (with heuristic rollout)
 # ---------------------------
 
 class MNode:
-    __slots__ = ("state_key","state","move","parent","children","visits","wins","untried")
+    __slots__ = ("state_key","state","move","parent","children","visits","wins","untried",
+                 "mean","inv_sqrt_visits")
     def __init__(self, state, move=None):
         self.state = state
         self.state_key = canonical_key(state)
         self.move = move
         self.parent = None
-        self.children = []
+        self.children = {}  # move -> MNode
         self.visits = 0
         self.wins = 0.0
-        self.untried = list(state["available_moves"])
-
-    def uct_score(self, child, c=1.4):
-        if child.visits == 0:
-            return float('inf')
-        return (child.wins / child.visits) + c * math.sqrt(math.log(self.visits + 1) / child.visits)
+        # wins / visits and 1 / sqrt(visits), kept up to date by backpropagation for UCT
+        self.mean = 0.0
+        self.inv_sqrt_visits = 0.0
+        # Moves not expanded yet, shuffled once so expansion can pop a random one in O(1).
+        # Most nodes never get expanded, so the list is only made on the first expansion
+        self.untried = None
+
+def classify_moves(moves, sides, move_boxes):
+    """Sort moves in one pass. Returns (mv, None) for the first move that completes
+    a box, else (None, safe) where safe lists the moves that leave no box with 3 sides."""
+    safe = []
+    for mv in moves:
+        risky = False
+        for box in move_boxes[mv]:
+            if sides[box] == 3:
+                return mv, None
+            # if the move increases sides to 3, it's risky
+            if sides[box] == 2:
+                risky = True
+        if not risky:
+            safe.append(mv)
+    return None, safe
 
 def rollout_policy(state):
     """Heuristic rollout policy:
@@ -177,34 +265,11 @@ def rollout_policy(state):
     - Else avoid moves that create a 3-sided box if possible.
     - Otherwise random.
     """
-    # immediate wins
-    for mv in state["available_moves"]:
-        s2, completed = apply_move(state, mv, state.get("next_player", state["your_player_id"]))
-        if completed > 0:
-            return mv
-
-    # avoid risky moves
-    safe = []
-    for mv in state["available_moves"]:
-        r, c, o = mv
-        risky = False
-        width, height = state["board_size"]
-        # check boxes that would be affected: if any becomes 3-sided after this move, it's risky
-        if o == 'H':
-            affected = [(r - 1, c), (r, c)]
-        else:
-            affected = [(r, c - 1), (r, c)]
-        # simulate single-line add (without completing)
-        for br, bc in affected:
-            if 0 <= br < height and 0 <= bc < width:
-                # count current sides (before move)
-                sides_before = count_sides(br, bc, state)
-                # if the move increases sides to 3, it's risky
-                if sides_before == 2:
-                    risky = True
-                    break
-        if not risky:
-            safe.append(mv)
+    _, _, move_boxes, _, _ = board_tables(*state["board_size"])
+    # immediate wins, else avoid risky moves
+    win, safe = classify_moves(state["available_moves"], state["sides"], move_boxes)
+    if win is not None:
+        return win
 
     if safe:
         return random.choice(safe)
@@ -214,51 +279,80 @@ def rollout_policy(state):
 
 def simulate_playout(state, me_id):
     """Simulate a full game from state using rollout_policy. Return 1 if me wins, 0 lose/draw."""
-    s = copy.deepcopy(state)
-    current = s.get("next_player", s["your_player_id"])
+    # One scratch copy per playout, played forward in place
+    s = clone_state(state)
+    current = s["next_player"]
     while s["available_moves"]:
         mv = rollout_policy(s)
-        s, completed = apply_move(s, mv, current)
+        completed = apply_move_inplace(s, mv, current)
         if completed == 0:
-            current = s["next_player"]
+            current = 3 - current
         # else current remains (scored a box)
 
     # final scoring
-    scores = {1:0, 2:0}
-    for owner in s["box_owners"].values():
-        scores[owner] += 1
     me = me_id
     opp = 3 - me
-    if scores[me] > scores[opp]:
+    if s["owned"][me].bit_count() > s["owned"][opp].bit_count():
         return 1
     else:
         return 0
 
-def mcts_choose_move(root_state, me_id, iterations):
-    root = MNode(root_state)
-
-    # quick safety: if only one move, return it
-    if len(root_state["available_moves"]) == 1:
-        return root_state["available_moves"][0]
+_last_root = None  # root of the last serial search, kept so the next one can continue its tree
+
+def find_reused_root(root_state):
+    """Return the node for root_state in the last search's tree, or None if the moves
+    played since then weren't explored there. Only nodes whose lines are all drawn in
+    root_state can lead to it, so only those are searched."""
+    if _last_root is None:
+        return None
+    key = canonical_key(root_state)
+    lines = root_state["lines"]
+    moves = root_state["move_index"].keys()
+    stack = [_last_root]
+    while stack:
+        node = stack.pop()
+        if node.state_key == key:
+            # same position; also check it was searched for the same player and move list
+            if (node.state["your_player_id"] == root_state["your_player_id"] and
+                    node.state["move_index"].keys() == moves):
+                return node
+            continue
+        for child in node.children.values():
+            if child.state["lines"] & ~lines == 0:
+                stack.append(child)
+    return None
+
+def run_mcts(root, me_id, iterations):
+    """Grow the tree under root for the given number of iterations and return root."""
+    root_state = root.state
 
     for _ in range(iterations):
         node = root
-        state = copy.deepcopy(root_state)
+        state = root_state  # apply_move copies, so the root state is never changed
 
         # SELECTION
-        while node.untried == [] and node.children:
-            # pick child with best UCT
-            node = max(node.children, key=lambda c: node.uct_score(c))
-            state, _ = apply_move(state, node.move, state.get("next_player", state["your_player_id"]))
+        while not node.untried and node.children:
+            # pick child with best UCT; each child was visited when it was expanded
+            explore = 1.4 * math.sqrt(math.log(node.visits + 1))
+            best_score = -1.0
+            for child in node.children.values():
+                score = child.mean + explore * child.inv_sqrt_visits
+                if score > best_score:
+                    best_score = score
+                    best = child
+            node = best
+            state = node.state
 
         # EXPANSION
+        if node.untried is None:
+            node.untried = list(node.state["available_moves"])
+            random.shuffle(node.untried)
         if node.untried:
-            mv = random.choice(node.untried)
-            state, completed = apply_move(state, mv, state.get("next_player", state["your_player_id"]))
+            mv = node.untried.pop()
+            state, completed = apply_move(state, mv, state["next_player"])
             child = MNode(state, move=mv)
             child.parent = node
-            node.children.append(child)
-            node.untried.remove(mv)
+            node.children[mv] = child
             node = child
 
         # SIMULATION
@@ -268,12 +362,70 @@ def mcts_choose_move(root_state, me_id, iterations):
         while node is not None:
             node.visits += 1
             node.wins += reward
+            node.mean = node.wins / node.visits
+            node.inv_sqrt_visits = 1 / math.sqrt(node.visits)
             node = node.parent
 
+    return root
+
+def mcts_choose_move(root_state, me_id, iterations):
+    # quick safety: if only one move, return it
+    if len(root_state["available_moves"]) == 1:
+        return root_state["available_moves"][0]
+
+    if ROOT_WORKERS > 1:
+        move = root_parallel_move(root_state, me_id, iterations)
+        if move is not None:
+            return move
+
+    # Carry on from the last search's subtree for this position if there is one
+    global _last_root
+    root = find_reused_root(root_state)
+    if root is None:
+        root = MNode(root_state)
+    root.parent = None
+    run_mcts(root, me_id, iterations)
+    _last_root = root
+
     # pick child with best visit count / win rate
-    best = max(root.children, key=lambda c: (c.wins / (c.visits + 1e-9), c.visits))
+    best = max(root.children.values(), key=lambda c: (c.wins / (c.visits + 1e-9), c.visits))
     return best.move
 
+# ---------------------------
+# Root-parallel MCTS
+# ---------------------------
+
+def start_root_pool(task):
+    """ROOT_WORKERS forked processes running task for one search, or None where
+    processes can't fork."""
+    # Imported here so the file still stands alone while ROOT_WORKERS is 1
+    from fork_pool import ForkPool, available
+    return ForkPool(ROOT_WORKERS, task) if available() else None
+
+def root_child_stats(seed, root_state, me_id, iterations):
+    """Worker side of the root-parallel search: grows one tree with its own random
+    seed and returns {move: (visits, wins)} for the children of its root."""
+    random.seed(seed)
+    root = run_mcts(MNode(root_state), me_id, iterations)
+    return {move: (child.visits, child.wins) for move, child in root.children.items()}
+
+def root_parallel_move(root_state, me_id, iterations):
+    """Grows ROOT_WORKERS independent trees at once and picks the move with the most
+    visits summed over all of them. The trees share nothing, so no locking is needed.
+    Returns None if there are no workers, and the search then runs in this process."""
+    share = -(-iterations // ROOT_WORKERS)
+    pool = start_root_pool(lambda seed: root_child_stats(seed, root_state, me_id, share))
+    if pool is None:
+        return None
+    with pool:
+        futures = [pool.submit_task(random.getrandbits(64)) for _ in range(ROOT_WORKERS)]
+
+        visits = defaultdict(int)
+        for future in futures:
+            for move, (child_visits, _) in future.result().items():
+                visits[move] += child_visits
+    return max(visits, key=visits.get)
+
 # ---------------------------
 # Public API: make_move(game_state)
 # ---------------------------
@@ -283,8 +435,7 @@ def make_move(game_state):
     Ultimate-playing bot entry point. Expects game_state in the form:
     {
       "board_size": (width, height),
-      "horizontal_lines": set(),
-      "vertical_lines": set(),
+      "h_bits": int, "v_bits": int,
       "box_owners": dict(),
       "your_player_id": 1 or 2,
       "available_moves": [(r,c,o), ...]
@@ -292,35 +443,37 @@ def make_move(game_state):
     }
     Returns a move (r, c, 'H' or 'V').
     """
-    # Normalize next_player
-    if "next_player" not in game_state:
-        game_state["next_player"] = game_state["your_player_id"]
+    # Work on packed lines from here on (next_player defaults to us)
+    game_state = new_state(game_state)
 
     me = game_state["your_player_id"]
     next_p = game_state["next_player"]
+    _, _, move_boxes, _, _ = board_tables(*game_state["board_size"])
 
     # 1) Immediate winning move: if we can complete a box now, do it.
-    for mv in game_state["available_moves"]:
-        s2, completed = apply_move(game_state, mv, next_p)
-        if completed > 0:
-            # If it's our turn, and we complete a box, play it.
-            # If it's opponent's turn, avoid - but typically game harness calls on our turn.
-            return mv
+    # The same pass finds the safe moves used in 3)
+    win, safe_moves = classify_moves(game_state["available_moves"], game_state["sides"], move_boxes)
+    if win is not None:
+        # If it's our turn, and we complete a box, play it.
+        # If it's opponent's turn, avoid - but typically game harness calls on our turn.
+        return win
 
     # 2) If very small remaining space, run exact solver.
     N_avail = len(game_state["available_moves"])
     if N_avail <= 10:
-        # Use exact solver: evaluate every candidate move
+        # Use exact solver: evaluate every candidate move, sharing one table between them
+        # Only a move beating the best so far matters, so each is searched in the window above it
         best_move = None
-        best_val = -10**9
+        best_val = -INF
+        table = {}
         for mv in game_state["available_moves"]:
             s2, completed = apply_move(game_state, mv, next_p)
             if completed > 0:
-                val = completed + solve_exact(s2)  # same player's perspective continues
+                val = completed + solve_exact(s2, table, best_val - completed, INF)  # same player's perspective continues
             else:
                 # opponent to move, value is negative of opponent's optimal result
                 # solve_exact returns value for player to move in s2 (which will be opponent)
-                val = -solve_exact(s2)
+                val = -solve_exact(s2, table, -INF, -best_val)
             if val > best_val:
                 best_val = val
                 best_move = mv
@@ -334,29 +487,14 @@ def make_move(game_state):
     iterations = int(min(8000, max(300, base * (area / 4.0))))  # ~300..8000
     # Prefer picking moves that minimize giving the opponent a 3-sided box
     # quick filter: avoid moves that create a 3-sided box if there are safe moves
-    safe_moves = []
-    for mv in game_state["available_moves"]:
-        r, c, o = mv
-        risky = False
-        if o == 'H':
-            affected = [(r - 1, c), (r, c)]
-        else:
-            affected = [(r, c - 1), (r, c)]
-        for br, bc in affected:
-            if 0 <= br < height and 0 <= bc < width:
-                if count_sides(br, bc, game_state) == 2:
-                    risky = True
-                    break
-        if not risky:
-            safe_moves.append(mv)
     if safe_moves:
         # sample root states replacing available_moves with safe subset for expansion
         # create a temporary copy and run MCTS biased to safe moves by replacing root.available_moves
-        temp = copy.deepcopy(game_state)
-        temp["available_moves"] = safe_moves
+        temp = dict(game_state)
+        set_moves(temp, safe_moves)
         mv = mcts_choose_move(temp, me, iterations)
         # If chosen mv was a placeholder (from safe list), return it, else fallback
-        if mv in game_state["available_moves"]:
+        if mv in game_state["move_index"]:
             return mv
 
     # fallback: run normal MCTS on full state
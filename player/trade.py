@@ -1,56 +1,51 @@
 import random
 
-def count_sides(r, c, game_state):
-    """Helper: count how many sides of the box at (r, c) are filled."""
-    count = 0
-    if (r, c) in game_state["horizontal_lines"]:
-        count += 1
-    if (r + 1, c) in game_state["horizontal_lines"]:
-        count += 1
-    if (r, c) in game_state["vertical_lines"]:
-        count += 1
-    if (r, c + 1) in game_state["vertical_lines"]:
-        count += 1
-    return count
+_tables = {}
 
-def move_creates_box(move, game_state):
-    """Check if a move completes any box."""
-    r, c, orientation = move
-    if orientation == 'H':
-        # Check below
-        if r < game_state["board_size"][1] and count_sides(r, c, game_state) == 3:
-            return True
-        # Check above
-        if r > 0 and count_sides(r - 1, c, game_state) == 3:
-            return True
-    else:  # 'V'
-        # Check right
-        if c < game_state["board_size"][0] and count_sides(r, c, game_state) == 3:
-            return True
-        # Check left
-        if c > 0 and count_sides(r, c - 1, game_state) == 3:
-            return True
-    return False
+def board_tables(width, height):
+    """Return (total_h, box_masks, move_boxes) for a board size, built once and cached.
+    Lines are packed into one int like DotsAndBoxesGame's edges: horizontal line (r, c)
+    is bit r*width + c, vertical line (r, c) is bit total_h + r*(width+1) + c.
+    box_masks[r*width + c] is the packed four-side mask of box (r, c) and
+    move_boxes[move] holds the ids of the boxes on either side of the line."""
+    key = (width, height)
+    if key not in _tables:
+        total_h = width * (height + 1)
+        box_masks = [(1 << (r * width + c)) | (1 << ((r + 1) * width + c)) |
+                     (1 << (total_h + r * (width + 1) + c)) |
+                     (1 << (total_h + r * (width + 1) + c + 1))
+                     for r in range(height) for c in range(width)]
 
-def move_creates_risk(move, game_state):
-    """Check if a move would create a box with 3 sides (giving opponent an easy point)."""
-    r, c, orientation = move
-    risky = False
-    if orientation == 'H':
-        # below
-        if r < game_state["board_size"][1] and count_sides(r, c, game_state) == 2:
-            risky = True
-        # above
-        if r > 0 and count_sides(r - 1, c, game_state) == 2:
-            risky = True
-    else:  # 'V'
-        # right
-        if c < game_state["board_size"][0] and count_sides(r, c, game_state) == 2:
-            risky = True
-        # left
-        if c > 0 and count_sides(r, c - 1, game_state) == 2:
-            risky = True
-    return risky
+        def box_ids(*boxes):
+            return tuple(r * width + c for r, c in boxes if 0 <= r < height and 0 <= c < width)
+
+        move_boxes = {}
+        for r in range(height + 1):
+            for c in range(width):
+                move_boxes[(r, c, 'H')] = box_ids((r, c), (r - 1, c))  # below, above
+        for r in range(height):
+            for c in range(width + 1):
+                move_boxes[(r, c, 'V')] = box_ids((r, c), (r, c - 1))  # right, left
+        _tables[key] = (total_h, box_masks, move_boxes)
+    return _tables[key]
+
+# Flags from box_flags/move_flags, named for what a move beside such a box does
+GIVES_BOX = 1 << 2      # the box has 2 sides, so the move leaves it on 3 for the opponent to take
+COMPLETES_BOX = 1 << 3  # the box has 3 sides, so the move completes it
+
+def box_flags(game_state):
+    """Helper: for every box, indexed r*width + c, the flag 1 << (number of filled sides)."""
+    total_h, box_masks, _ = board_tables(*game_state["board_size"])
+    lines = game_state["h_bits"] | (game_state["v_bits"] << total_h)
+    return [1 << (lines & mask).bit_count() for mask in box_masks]
+
+def move_flags(move, flags, move_boxes):
+    """OR together the flags of the boxes beside a move's line, so one bit test tells
+    whether the move completes a box (COMPLETES_BOX) or sets one up (GIVES_BOX)."""
+    result = 0
+    for b in move_boxes[move]:
+        result |= flags[b]
+    return result
 
 def make_move(game_state):
     """
@@ -58,14 +53,24 @@ def make_move(game_state):
     takes boxes when safe, and plays long-term positional strategy.
     """
     available_moves = game_state["available_moves"]
+    _, _, move_boxes = board_tables(*game_state["board_size"])
+    flags = box_flags(game_state)
+
+    # Sort the moves in one pass: those completing a box, and the safe ones.
+    box_moves = []
+    safe_moves = []
+    for m in available_moves:
+        m_flags = move_flags(m, flags, move_boxes)
+        if m_flags & COMPLETES_BOX:
+            box_moves.append(m)
+        elif not box_moves and not m_flags & GIVES_BOX:
+            safe_moves.append(m)
 
     # If any move completes a box, take it.
-    box_moves = [m for m in available_moves if move_creates_box(m, game_state)]
     if box_moves:
         return random.choice(box_moves)
 
     # Avoid moves that set up 3-sides boxes.
-    safe_moves = [m for m in available_moves if not move_creates_risk(m, game_state)]
     if safe_moves:
         return random.choice(safe_moves)
 
@@ -3,31 +3,58 @@ import sys
 import itertools
 import subprocess
 import re
+import json
+import queue
+import signal
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Configuration
 PLAYER_DIR = "player"
 ROUNDS_PER_MATCH = 20
 BOARD_SIZE = (2, 2)
+MATCH_JOBS = os.cpu_count() or 1  # matches played at the same time, each in its own process
+MATCH_TIMEOUT = 600  # seconds
+
+_WINS_RE = re.compile(r'(\d+)\s+wins')
 
 def parse_winner_from_output(output, p1_file, p2_file):
     """
     Parses the stdout from game_match.py to find the winner.
-    This is dependent on the specific output format of game_match.py.
+    Reads the JSON result line that game_match.py --json ends with, and falls back
+    to scraping the "Final Score" lines of its plain output.
     """
     p1_wins = 0
     p2_wins = 0
 
-    # Use regex to find lines like "player_file.py: 55 wins"
-    for line in output.splitlines():
+    lines = output.rstrip().rsplit('\n', 64)  # the scores are at the end
+    try:
+        result = json.loads(lines[-1])
+        p1_wins = result["p1_wins"]
+        p2_wins = result["p2_wins"]
+    except (ValueError, TypeError, KeyError):
+        # Use regex to find lines like "player_file.py: 55 wins"
         # We use the base name for matching, as the output might not have the full path
-        if os.path.basename(p1_file) in line and 'wins' in line:
-            match = re.search(r'(\d+)\s+wins', line)
-            if match:
-                p1_wins = int(match.group(1))
-        elif os.path.basename(p2_file) in line and 'wins' in line:
-            match = re.search(r'(\d+)\s+wins', line)
-            if match:
-                p2_wins = int(match.group(1))
+        p1_base = os.path.basename(p1_file)
+        p2_base = os.path.basename(p2_file)
+        found_p1 = found_p2 = False
+        # Scan from the end so the last score printed for each player is the one used
+        for line in reversed(lines):
+            if 'wins' not in line:
+                continue
+            if not found_p1 and p1_base in line:
+                match = _WINS_RE.search(line)
+                if match:
+                    p1_wins = int(match.group(1))
+                    found_p1 = True
+            elif not found_p2 and p2_base in line:
+                match = _WINS_RE.search(line)
+                if match:
+                    p2_wins = int(match.group(1))
+                    found_p2 = True
+            if found_p1 and found_p2:
+                break
 
     if p1_wins > p2_wins:
         return p1_file
@@ -36,10 +63,115 @@ def parse_winner_from_output(output, p1_file, p2_file):
     else:
         return "Draw"
 
+# (process, stderr file) of the game_match.py --serve workers waiting for their next match.
+# Each plays many matches, so Python starts up and imports the game once per worker rather
+# than once per match
+_idle_workers = queue.SimpleQueue()
+
+def start_worker():
+    """Starts a game_match.py process that plays the matches written to its stdin, and
+    returns it with the temporary file its stderr goes to."""
+    command = [
+        sys.executable,         # The current python interpreter (e.g., 'python' or 'python3')
+        "game_match.py",        # The script to run
+        "--serve"               # Read matches from stdin, answer each with a JSON line
+    ]
+    stderr = tempfile.TemporaryFile()
+    # In a session of its own, so kill_worker can also stop any processes a player starts
+    worker = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=stderr,
+                              text=True, start_new_session=True)
+    return worker, stderr
+
+def kill_worker(worker):
+    """Kills a worker and every process it started, which could otherwise keep its stdout open."""
+    if hasattr(os, "killpg"):
+        try:
+            os.killpg(worker.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass  # the whole group has already exited
+    else:
+        worker.kill()
+
+def take_stderr(stderr):
+    """Returns what a worker has written to its stderr file since the last call, and empties it.
+    The worker shares the file's offset, so its next write goes to the start again."""
+    stderr.seek(0)
+    text = stderr.read().decode(errors="replace")
+    stderr.seek(0)
+    stderr.truncate()
+    return text
+
+def run_match(p1_path, p2_path):
+    """Plays one match on an idle worker, starting one if there is none, and returns the
+    match's output. Raises CalledProcessError if the match fails and TimeoutExpired if it
+    runs over MATCH_TIMEOUT, which also stops its worker."""
+    try:
+        worker, stderr = _idle_workers.get_nowait()
+    except queue.Empty:
+        worker, stderr = start_worker()
+
+    timed_out = threading.Event()
+
+    def expire():
+        timed_out.set()
+        kill_worker(worker)
+
+    timer = threading.Timer(MATCH_TIMEOUT, expire)
+    timer.start()
+    try:
+        worker.stdin.write(f"{p1_path}\t{p2_path}\t{ROUNDS_PER_MATCH}\t{BOARD_SIZE[0]}x{BOARD_SIZE[1]}\n")
+        worker.stdin.flush()
+        reply = worker.stdout.readline()
+    except BrokenPipeError:
+        reply = ""
+    finally:
+        timer.cancel()
+        # cancel() can't stop an expire() that has already started, so let it finish
+        timer.join()
+
+    if not reply:
+        # The worker died with the match, so it isn't reused
+        kill_worker(worker)
+        worker.wait()
+        errors = take_stderr(stderr)
+        stderr.close()
+        if timed_out.is_set():
+            raise subprocess.TimeoutExpired(worker.args, MATCH_TIMEOUT, stderr=errors)
+        raise subprocess.CalledProcessError(worker.returncode, worker.args,
+                                            stderr=errors or "(the match process exited without a result)")
+
+    errors = take_stderr(stderr)
+    if timed_out.is_set():
+        # The timer killed the worker just after it replied, so keep the result but not the worker
+        worker.wait()
+        stderr.close()
+    else:
+        _idle_workers.put((worker, stderr))
+    result = json.loads(reply)
+    if result["returncode"]:
+        raise subprocess.CalledProcessError(result["returncode"], worker.args,
+                                            output=result["output"], stderr=errors or result["output"])
+    return result["output"]
+
+def stop_workers():
+    """Closes the idle workers' stdin so they finish, and waits for them."""
+    while True:
+        try:
+            worker, stderr = _idle_workers.get_nowait()
+        except queue.Empty:
+            return
+        worker.stdin.close()
+        worker.wait()
+        stderr.close()
+
 def run_grand_tournament():
     """Finds all players, runs a round-robin tournament, and prints results."""
     print("Starting Dots and Boxes Tournament")
 
+    if not os.path.isfile("game_match.py"):
+        print("Error: 'game_match.py' not found. Make sure it's in the same directory.")
+        sys.exit(1)
+
     try:
         player_files = [f for f in os.listdir(PLAYER_DIR) if f.endswith('.py') and f != '__init__.py']
         if len(player_files) < 2:
@@ -53,31 +185,24 @@ def run_grand_tournament():
     matchups = list(itertools.combinations(player_files, 2))
     tournament_scores = {player: {'wins': 0, 'losses': 0, 'draws': 0} for player in player_files}
 
+    # Matchups are independent, so start them all at once. Each match runs in a worker
+    # process, so threads are enough to wait on them; results are reported in matchup order
+    executor = ThreadPoolExecutor(max_workers=MATCH_JOBS)
+    futures = [executor.submit(run_match, os.path.join(PLAYER_DIR, p1_file_base),
+                               os.path.join(PLAYER_DIR, p2_file_base))
+               for p1_file_base, p2_file_base in matchups]
+
     for i, (p1_file_base, p2_file_base) in enumerate(matchups):
         print(f"Match {i+1}/{len(matchups)}: {p1_file_base} vs {p2_file_base}")
-        
-        p1_path = os.path.join(PLAYER_DIR, p1_file_base)
-        p2_path = os.path.join(PLAYER_DIR, p2_file_base)
-        
-        # Construct the exact command you would type in the terminal
-        command = [
-            sys.executable,         # The current python interpreter (e.g., 'python' or 'python3')
-            "game_match.py",        # The script to run
-            p1_path,                # First argument
-            p2_path,                # Second argument
-            "--rounds", str(ROUNDS_PER_MATCH),
-            "--size", f"{BOARD_SIZE[0]}x{BOARD_SIZE[1]}"
-        ]
 
         try:
-            # Run the command as a separate process and capture its output
-            result = subprocess.run(command, capture_output=True, text=True, check=True, timeout=600)
+            output = futures[i].result()
             
             # Print the output from the match so you can see the details
-            print(result.stdout)
+            print(output)
             
             # Parse the winner from the captured output
-            match_winner_base = parse_winner_from_output(result.stdout, p1_file_base, p2_file_base)
+            match_winner_base = parse_winner_from_output(output, p1_file_base, p2_file_base)
 
             if match_winner_base == p1_file_base:
                 print(f"  {p1_file_base} wins the match!")
@@ -92,16 +217,15 @@ def run_grand_tournament():
                 tournament_scores[p1_file_base]['draws'] += 1
                 tournament_scores[p2_file_base]['draws'] += 1
 
-        except FileNotFoundError:
-            print("  ERROR: 'game_match.py' not found. Make sure it's in the same directory.")
-            break # No point continuing if the main script is missing
         except subprocess.CalledProcessError as e:
             print(f"  ERROR: The match crashed. Output:\n{e.stderr}")
         except subprocess.TimeoutExpired:
-            print("  ERROR: Match took too long (over 10 minutes) and was terminated.")
+            print(f"  ERROR: Match took too long (over {MATCH_TIMEOUT} seconds) and was terminated.")
         
         print("-" * 50 + "\n")
 
+    executor.shutdown(cancel_futures=True)
+    stop_workers()
 
     # Display the final leaderboard
     print("\nFinal Leaderboard")